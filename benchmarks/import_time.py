@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+# Statements that are timed in a fresh interpreter each.
+STATEMENTS = {
+    # What every process pays now.
+    "import gym_lawnmower": "import gym_lawnmower",
+    # What every process paid before pygame and the images were loaded lazily.
+    "import gym_lawnmower + pygame + images": "import gym_lawnmower; from gym_lawnmower.envs import lawnmower_env; lawnmower_env.get_grid_to_image()",
+}
+REPETITIONS = 10
+
+
+def main():
+
+    for name, statement in STATEMENTS.items():
+        durations = [time_statement(statement) for _ in range(REPETITIONS)]
+        print("{:<45} min {:8.1f} ms  mean {:8.1f} ms".format(name, 1000 * min(durations), 1000 * sum(durations) / len(durations)))
+
+
+def time_statement(statement):
+    """
+    Times a statement in a fresh interpreter. The interpreter start-up is not
+    included.
+    """
+    code = "import time; start = time.perf_counter(); {}; print(time.perf_counter() - start)".format(statement)
+    output = subprocess.check_output([sys.executable, "-c", code], stderr=subprocess.DEVNULL)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import time
+import numpy as np
+from gym_lawnmower.envs import LawnmowerEnv
+
+# Lawn sizes to compare. The first one is the size of lawnmower-big-v0.
+SIZES = [17, 64, 256, 1024]
+STEPS = 100000
+OBSTACLE_DENSITY = 1 / 32
+
+
+def main():
+
+    print("{:>6} {:>14} {:>14} {:>14}".format("size", "steps/s", "renders/s", "resets/s"))
+    for size in SIZES:
+        steps_per_second, renders_per_second, resets_per_second = benchmark(size)
+        print("{:>6} {:>14.0f} {:>14.0f} {:>14.1f}".format(size, steps_per_second, renders_per_second, resets_per_second))
+
+
+def benchmark(size):
+    """
+    Runs random actions on a lawn with windowed observations and a render
+    viewport. Steps and resets are timed separately.
+    """
+    environment = LawnmowerEnv(
+        size, size,
+        obstacle_number=int(size * size * OBSTACLE_DENSITY),
+        max_steps=10 * size * size,
+        observation_type="window",
+        window_size=15,
+        render_viewport=(17, 17),
+        tile_size=8
+    )
+    environment.reset(seed=0)
+    actions = np.random.default_rng(0).choice(3, size=STEPS, p=[0.8, 0.1, 0.1]).tolist()
+
+    # Steps.
+    step_duration = 0.0
+    reset_duration = 0.0
+    resets = 0
+    for action in actions:
+        start = time.perf_counter()
+        _, _, done, _ = environment.step(action)
+        step_duration += time.perf_counter() - start
+        if done:
+            start = time.perf_counter()
+            environment.reset()
+            reset_duration += time.perf_counter() - start
+            resets += 1
+
+    # Renders.
+    renders = 1000
+    start = time.perf_counter()
+    for _ in range(renders):
+        environment.render(mode="rgb_array")
+    render_duration = time.perf_counter() - start
+
+    return STEPS / step_duration, renders / render_duration, resets / reset_duration if resets > 0 else float("nan")
+
+
+if __name__ == "__main__":
+    main()
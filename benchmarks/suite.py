@@ -0,0 +1,175 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import time
+import tracemalloc
+import numpy as np
+import gym
+import gym_lawnmower
+from gym_lawnmower.envs import LawnmowerEnv, LawnmowerVectorEnv, LawnmowerSubprocVectorEnv
+from gym_lawnmower.envs.lawnmower_env import LAWN_KWARGS
+from import_time import time_statement
+
+# Render modes that work without a display.
+RENDER_MODES = ["rgb_array", "console"]
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmarks all registered lawnmower environments.")
+    parser.add_argument("--output", default="benchmark_results.json", help="The JSON file to write.")
+    parser.add_argument("--steps", type=int, default=20000, help="Steps per measurement.")
+    parser.add_argument("--resets", type=int, default=200, help="Resets per measurement.")
+    parser.add_argument("--renders", type=int, default=200, help="Renders per mode.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[], help="Additional square lawn sizes.")
+    parser.add_argument("--number", type=int, default=64, help="Lawns in the vector environments.")
+    parser.add_argument("--subproc", action="store_true", help="Also benchmark the subprocess vector environment.")
+    parser.add_argument("--window", action="store_true", help="Also benchmark the pygame window render mode.")
+    arguments = parser.parse_args()
+
+    render_modes = RENDER_MODES + (["window"] if arguments.window else [])
+
+    results = {
+        "date": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "import_seconds": time_statement("import gym_lawnmower"),
+        "environments": {},
+    }
+
+    for name, kwargs in get_configurations(arguments.sizes).items():
+        print("Benchmarking {}...".format(name))
+        result = {"kwargs": {key: str(value) for key, value in kwargs.items()}}
+        result["single"] = benchmark_single(kwargs, arguments.steps, arguments.resets, arguments.renders, render_modes)
+        result["vector"] = benchmark_vector(LawnmowerVectorEnv, kwargs, arguments.number, arguments.steps // 10)
+        if arguments.subproc:
+            result["subproc"] = benchmark_vector(LawnmowerSubprocVectorEnv, kwargs, arguments.number, arguments.steps // 10)
+        results["environments"][name] = result
+        print(json.dumps(result, indent=2))
+
+    with open(arguments.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print("Wrote {}.".format(arguments.output))
+
+
+def get_configurations(sizes):
+    """
+    Yields the kwargs of all registered lawnmower environments and of the
+    additional sizes.
+    """
+    registry = gym.envs.registry
+    environment_ids = registry.keys() if isinstance(registry, dict) else [spec.id for spec in registry.all()]
+    configurations = {}
+    for environment_id in sorted(environment_ids):
+        if environment_id.startswith("lawnmower-"):
+            # Older versions of gym only have the private kwargs.
+            spec = gym.spec(environment_id)
+            configurations[environment_id] = dict(spec.kwargs if hasattr(spec, "kwargs") else spec._kwargs)
+    for size in sizes:
+        configurations["custom-{}".format(size)] = {
+            "width": size,
+            "height": size,
+            "obstacle_number": size * size // 32,
+            "max_steps": 3 * size * size,
+            "observation_type": "window",
+            "window_size": 15,
+            "render_viewport": (17, 17),
+        }
+    return configurations
+
+
+def random_actions(count, action_number):
+    """
+    Yields random actions that mostly move forward.
+    """
+    probabilities = np.full(action_number, 0.2 / (action_number - 1))
+    probabilities[0] = 0.8
+    return np.random.default_rng(0).choice(action_number, size=count, p=probabilities).tolist()
+
+
+def benchmark_single(kwargs, steps, resets, renders, render_modes):
+    """
+    Measures steps, resets, renders and memory of a LawnmowerEnv.
+    """
+    result = {}
+    for observation_mode in ["copy", "view"]:
+        environment = LawnmowerEnv(observation_mode=observation_mode, **kwargs)
+        environment.reset(seed=0)
+        actions = random_actions(steps, environment.action_space.n)
+        result[observation_mode] = {
+            "steps_per_second": measure_steps(environment, actions),
+            "allocated_bytes_per_step": measure_allocations(environment, actions[:1000]),
+        }
+
+    # Resets.
+    start = time.perf_counter()
+    for _ in range(resets):
+        environment.reset()
+    result["resets_per_second"] = resets / (time.perf_counter() - start)
+
+    # Renders. Console output is discarded.
+    result["renders_per_second"] = {}
+    for mode in render_modes:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            environment.render(mode=mode)
+            start = time.perf_counter()
+            for _ in range(renders):
+                environment.render(mode=mode)
+            result["renders_per_second"][mode] = renders / (time.perf_counter() - start)
+    return result
+
+
+def measure_steps(environment, actions):
+    """
+    Yields the steps per second. The time for resets is not included.
+    """
+    duration = 0.0
+    for action in actions:
+        start = time.perf_counter()
+        _, _, done, _ = environment.step(action)
+        duration += time.perf_counter() - start
+        if done:
+            environment.reset()
+    return len(actions) / duration
+
+
+def measure_allocations(environment, actions):
+    """
+    Yields the mean of the memory that is allocated temporarily per step.
+    """
+    allocated = 0
+    for action in actions:
+        # Restart the tracing, since tracemalloc.reset_peak needs Python 3.9.
+        tracemalloc.start()
+        _, _, done, _ = environment.step(action)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        allocated += peak
+        if done:
+            environment.reset()
+    return allocated / len(actions)
+
+
+def benchmark_vector(environment_class, kwargs, number, steps):
+    """
+    Measures the lawn steps per second of a vector environment.
+    """
+    vector_kwargs = {key: kwargs[key] for key in LAWN_KWARGS}
+    environment = environment_class(number, observation_mode="view", **vector_kwargs)
+    environment.reset(seed=0)
+    actions = np.array(random_actions(steps * number, 3)).reshape(steps, number)
+    start = time.perf_counter()
+    for step_actions in actions:
+        environment.step(step_actions)
+    duration = time.perf_counter() - start
+    if hasattr(environment, "close"):
+        environment.close()
+    return {"number": number, "lawn_steps_per_second": steps * number / duration}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import warnings
+warnings.filterwarnings("ignore")
+import argparse
+import collections
+import json
+import time
+import numpy as np
+import gym_lawnmower
+from gym_lawnmower.envs import LawnmowerVectorEnv, LawnmowerSubprocVectorEnv
+from kerasrl_train import LawnmowerProcessor, build_model_cnn, INPUT_SHAPE, WINDOW_LENGTH
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Evaluates trained weights on many seeded episodes at once.")
+    parser.add_argument("weights", help="The weights file, as saved by the training.")
+    parser.add_argument("--environment", default="lawnmower-medium-obstacles-v0", help="The registered environment.")
+    parser.add_argument("--episodes", type=int, default=1000, help="Episodes in total.")
+    parser.add_argument("--number", type=int, default=100, help="Lawns that run at once.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the lawns.")
+    parser.add_argument("--subproc", action="store_true", help="Run the lawns in worker processes.")
+    parser.add_argument("--output", default=None, help="Optionally write the results to this JSON file.")
+    arguments = parser.parse_args()
+
+    # Every lawn runs the same number of episodes.
+    assert arguments.episodes % arguments.number == 0, "The episodes have to be a multiple of the number of lawns."
+
+    # Create the lawns.
+    environment_class = LawnmowerSubprocVectorEnv if arguments.subproc else LawnmowerVectorEnv
+    environment = environment_class.from_spec(arguments.number, arguments.environment)
+
+    # Build the model and load the weights.
+    model = build_model_cnn((WINDOW_LENGTH,) + INPUT_SHAPE, environment.single_action_space.n)
+    model.load_weights(arguments.weights)
+
+    # Evaluate.
+    start = time.time()
+    results = evaluate(environment, model, LawnmowerProcessor(), arguments.episodes // arguments.number, arguments.seed)
+    results["seconds"] = time.time() - start
+    if hasattr(environment, "close"):
+        environment.close()
+
+    print(json.dumps(results, indent=2))
+    if arguments.output is not None:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+def evaluate(environment, model, processor, episodes_per_lawn, seed):
+    """
+    Runs episodes_per_lawn episodes on every lawn of a vector environment
+    with the greedy policy of the model, like dqn.test does. The Q-values of
+    all lawns are computed in one batch. Windows start with zeros, like
+    during training. Yields the statistics of the returns, the rates of the
+    done reasons and the mean steps of the episodes that mowed everything.
+    """
+    number = environment.number
+    observations = environment.reset(seed=seed)
+
+    # The last WINDOW_LENGTH observations of every lawn. The newest comes last.
+    windows = np.zeros((number, WINDOW_LENGTH) + observations.shape[1:], dtype=np.uint8)
+    windows[:, -1] = observations
+
+    # Per lawn.
+    episode_rewards = np.zeros(number)
+    episode_steps = np.zeros(number, dtype=np.int64)
+    episode_counts = np.zeros(number, dtype=np.int64)
+
+    # Per finished episode.
+    returns = []
+    done_reasons = collections.Counter()
+    coverage_steps = []
+
+    while np.any(episode_counts < episodes_per_lawn):
+
+        # Act greedily on all lawns at once.
+        q_values = model.predict_on_batch(processor.process_state_batch(windows))
+        actions = np.argmax(q_values, axis=1)
+        observations, rewards, dones, infos = environment.step(actions)
+        episode_rewards += rewards
+        episode_steps += 1
+
+        # Slide the windows.
+        windows[:, :-1] = windows[:, 1:]
+        windows[:, -1] = observations
+
+        # Finished episodes. Lawns that ran all their episodes keep running but do not count.
+        for index in np.flatnonzero(dones):
+            if episode_counts[index] < episodes_per_lawn:
+                returns.append(episode_rewards[index])
+                done_reasons[infos[index]["done_reason"]] += 1
+                if infos[index]["done_reason"] == "All mowed":
+                    coverage_steps.append(episode_steps[index])
+                episode_counts[index] += 1
+            episode_rewards[index] = 0.
+            episode_steps[index] = 0
+
+        # The lawns have been reset. Start their windows with zeros.
+        windows[dones, :-1] = 0
+
+    episodes = len(returns)
+    return {
+        "episodes": episodes,
+        "return_mean": float(np.mean(returns)),
+        "return_std": float(np.std(returns)),
+        "done_reason_rates": {done_reason: count / episodes for done_reason, count in done_reasons.items()},
+        "completion_rate": done_reasons["All mowed"] / episodes,
+        "coverage_steps_mean": float(np.mean(coverage_steps)) if len(coverage_steps) > 0 else None,
+    }
+
+
+if __name__ == "__main__":
+    main()
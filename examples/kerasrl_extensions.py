@@ -1,22 +1,33 @@
 from rl.callbacks import Callback
+from rl.memory import Memory, Experience, sample_batch_indexes
 import tensorflow as tf
-from collections import deque
 import numpy as np
 import time
 import datetime
 
 class TensorboardCallback(Callback):
     """
-    Provides logging in TensorBoard.
+    Provides logging in TensorBoard. Keeps running means over the last
+    rewards and the last episodes in fixed-size buffers, so memory and the
+    cost of logging stay constant during long runs. Every log_interval steps
+    all means and the throughput in steps and episodes per second are
+    written as one summary.
     """
 
     def __init__(self, path="tensorboard", log_interval=1000, reward_buffer_length=10000, episode_duration_buffer_length=10000):
         self.log_interval = log_interval
+        self.episode_duration_buffer_length = episode_duration_buffer_length
         self.iterations = 0
         self.running_data = {}
-        self.running_data["reward"] = deque([], maxlen=reward_buffer_length)
+        self.running_data["reward"] = RunningMean(reward_buffer_length)
         self.tensorboard_writer = tf.summary.FileWriter(path, flush_secs=5)
 
+        # For measuring the throughput.
+        self.episodes = 0
+        self._last_log_time = time.perf_counter()
+        self._last_log_iterations = 0
+        self._last_log_episodes = 0
+
     def on_step_end(self, step, logs={}):
         """
         Logs data if log-interval exceeded.
@@ -24,10 +35,19 @@ class TensorboardCallback(Callback):
         self.running_data["reward"].append(logs["reward"])
 
         if self.iterations % self.log_interval == 0:
-            for key, values in self.running_data.items():
-                if len(values) > 0:
-                    mean = np.mean(values)
-                    self._log_scalar(key + "-mean", mean, self.iterations)
+            values = {key + "-mean": running_mean.mean for key, running_mean in self.running_data.items() if running_mean.count > 0}
+
+            # Throughput since the last log.
+            now = time.perf_counter()
+            duration = now - self._last_log_time
+            if self.iterations > 0 and duration > 0:
+                values["steps-per-second"] = (self.iterations - self._last_log_iterations) / duration
+                values["episodes-per-second"] = (self.episodes - self._last_log_episodes) / duration
+            self._last_log_time = now
+            self._last_log_iterations = self.iterations
+            self._last_log_episodes = self.episodes
+
+            self._log_scalars(values, self.iterations)
 
         self.iterations += 1
 
@@ -35,15 +55,194 @@ class TensorboardCallback(Callback):
         """
         Logs the duration of the episode.
         """
-
         for key, value in logs.items():
             if key not in self.running_data.keys():
-                self.running_data[key] = []
-            self.running_data[key].append(logs[key])
+                self.running_data[key] = RunningMean(self.episode_duration_buffer_length)
+            self.running_data[key].append(value)
+        self.episodes += 1
 
-    def _log_scalar(self, tag, value, step):
+    def on_train_end(self, logs={}):
         """
-        Accesses tensorbord to log a value.
+        Writes everything that is pending.
         """
-        summary = tf.Summary(value=[tf.Summary.Value(tag=tag, simple_value=value)])
+        self.tensorboard_writer.flush()
+
+    def _log_scalars(self, values, step):
+        """
+        Accesses tensorbord to log several values in one summary.
+        """
+        summary = tf.Summary(value=[tf.Summary.Value(tag=tag, simple_value=value) for tag, value in values.items()])
         self.tensorboard_writer.add_summary(summary, step)
+
+
+class RunningMean(object):
+    """
+    The mean of the last length values. The values are kept in a ring
+    buffer and their sum is updated with every append.
+    """
+
+    def __init__(self, length):
+        self.values = np.zeros(length)
+        self.count = 0
+        self.sum = 0.
+        self._index = 0
+
+    @property
+    def mean(self):
+        return self.sum / self.count
+
+    def append(self, value):
+        """
+        Adds a value and drops the oldest one if the buffer is full.
+        """
+        self.sum += value - self.values[self._index]
+        self.values[self._index] = value
+        self._index = (self._index + 1) % len(self.values)
+        self.count = min(self.count + 1, len(self.values))
+
+        # Recompute the sum once per round to avoid drift from rounding errors.
+        if self._index == 0:
+            self.sum = float(np.sum(self.values))
+
+
+class LawnmowerMemory(Memory):
+    """
+    Replay memory for lawnmower grids. Drop-in replacement for the
+    SequentialMemory of keras-rl with the same sampling rules. All
+    observations live in one preallocated uint8 array that is used as a ring.
+    With pack=True every cell takes 3 bits instead of 8, because grids only
+    hold the values 0 to 6. Windows of window_length observations are built
+    by index arithmetic and batches are gathered at once.
+    """
+
+    def __init__(self, limit, pack=False, **kwargs):
+        super(LawnmowerMemory, self).__init__(**kwargs)
+        self.limit = limit
+        self.pack = pack
+
+        # Allocated on the first append, when the shape of the observations is known.
+        self.observation_shape = None
+        self.observations = None
+        self.actions = np.zeros(limit, dtype=np.int32)
+        self.rewards = np.zeros(limit, dtype=np.float32)
+        self.terminals = np.zeros(limit, dtype=bool)
+
+        # Position of the next append and number of entries.
+        self._index = 0
+        self._length = 0
+
+    @property
+    def nb_entries(self):
+        return self._length
+
+    def append(self, observation, action, reward, terminal, training=True):
+        """
+        Appends an observation, the action taken in it, the reward for the
+        action and whether the action ended the episode.
+        """
+        super(LawnmowerMemory, self).append(observation, action, reward, terminal, training=training)
+        if not training:
+            return
+
+        if self.observations is None:
+            self.observation_shape = np.shape(observation)
+            frame = pack_cells(np.zeros(self.observation_shape, dtype=np.uint8)) if self.pack else np.zeros(self.observation_shape, dtype=np.uint8)
+            self.observations = np.zeros((self.limit,) + frame.shape, dtype=np.uint8)
+
+        observation = np.asarray(observation, dtype=np.uint8)
+        self.observations[self._index] = pack_cells(observation) if self.pack else observation
+        self.actions[self._index] = action
+        self.rewards[self._index] = reward
+        self.terminals[self._index] = terminal
+        self._index = (self._index + 1) % self.limit
+        self._length = min(self._length + 1, self.limit)
+
+    def sample(self, batch_size, batch_idxs=None):
+        """
+        Yields a list of batch_size experiences for the DQNAgent.
+        """
+        state0, actions, rewards, state1, terminal1 = self.sample_batch(batch_size, batch_idxs)
+        return [Experience(state0=state0[index], action=actions[index], reward=rewards[index], state1=state1[index], terminal1=terminal1[index]) for index in range(batch_size)]
+
+    def sample_batch(self, batch_size, batch_idxs=None):
+        """
+        Yields the arrays state0, actions, rewards, state1 and terminal1 of a
+        batch. States have the shape (batch_size, window_length) + the shape
+        of an observation. Like in the SequentialMemory the first entries
+        are never sampled and neither are transitions across episodes.
+        """
+        assert self.nb_entries >= self.window_length + 2, "not enough entries in the memory"
+
+        # Indices of the observations after the transitions.
+        if batch_idxs is None:
+            batch_idxs = sample_batch_indexes(self.window_length, self.nb_entries - 1, size=batch_size)
+        indices = np.asarray(batch_idxs, dtype=np.int64) + 1
+
+        # Skip transitions from the last observation of an episode to the first of the next.
+        while True:
+            resample = self._get_terminals(indices - 2)
+            if not np.any(resample):
+                break
+            indices[resample] = np.random.randint(self.window_length + 1, self.nb_entries, size=np.count_nonzero(resample))
+
+        # The window of state0 and the next observation.
+        offsets = np.arange(-self.window_length, 1)
+        frames = self._get_observations(indices[:, np.newaxis] + offsets)
+
+        # Observations before the start of the episode are zeroed.
+        if not self.ignore_episode_boundaries and self.window_length > 1:
+            ended = self._get_terminals(indices[:, np.newaxis] - 2 - np.arange(1, self.window_length))
+            before_start = np.logical_or.accumulate(ended, axis=1)[:, ::-1]
+            frames[:, :self.window_length - 1][before_start] = 0
+
+        state0 = frames[:, :-1]
+        state1 = frames[:, 1:]
+        actions = self.actions[self._to_physical(indices - 1)]
+        rewards = self.rewards[self._to_physical(indices - 1)]
+        terminal1 = self.terminals[self._to_physical(indices - 1)]
+        return state0, actions, rewards, state1, terminal1
+
+    def get_config(self):
+        config = super(LawnmowerMemory, self).get_config()
+        config["limit"] = self.limit
+        config["pack"] = self.pack
+        return config
+
+    def _to_physical(self, indices):
+        """
+        Maps indices counted from the oldest entry to positions in the ring.
+        """
+        return (self._index - self._length + indices) % self.limit
+
+    def _get_terminals(self, indices):
+        return self.terminals[self._to_physical(indices)]
+
+    def _get_observations(self, indices):
+        observations = self.observations[self._to_physical(indices)]
+        if self.pack:
+            observations = unpack_cells(observations, self.observation_shape)
+        return observations
+
+
+# Bits per cell of packed observations.
+CELL_BITS = 3
+
+
+def pack_cells(observations):
+    """
+    Packs the cells of observations with values from 0 to 7 into 3 bits each.
+    The last two axes are the cells. Every bit of the cells is packed into
+    its own bit plane.
+    """
+    cells = observations.reshape(observations.shape[:-2] + (1, -1))
+    bits = (cells >> np.arange(CELL_BITS, dtype=np.uint8)[:, np.newaxis]) & 1
+    return np.packbits(bits, axis=-1)
+
+
+def unpack_cells(packed, shape):
+    """
+    Reverses pack_cells. The shape is the one of a single observation.
+    """
+    bits = np.unpackbits(packed, axis=-1, count=int(np.prod(shape)))
+    cells = bits[..., 0, :] | (bits[..., 1, :] << 1) | (bits[..., 2, :] << 2)
+    return cells.reshape(packed.shape[:-2] + tuple(shape))
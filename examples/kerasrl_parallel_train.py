@@ -0,0 +1,309 @@
+import warnings
+warnings.filterwarnings("ignore")
+import argparse
+import numpy as np
+import gym
+import gym_lawnmower
+import multiprocessing
+import queue
+import time
+from collections import deque
+from keras import backend, optimizers
+from rl.util import huber_loss
+from kerasrl_train import LawnmowerProcessor, build_model_cnn, INPUT_SHAPE, WINDOW_LENGTH, STEPS
+from kerasrl_extensions import LawnmowerMemory
+
+# Actors that run environments. The learner has a process of its own.
+#
+# The learner limits the scaling. All updates happen in its one process, one
+# update per TRAIN_INTERVAL steps like in the serial example. So the steps per
+# second can never exceed TRAIN_INTERVAL times the updates per second of the
+# learner, however many actors run. While the learner is behind it takes no
+# transitions, the queue of 4 * ACTOR_NUMBER chunks fills up and the actors
+# wait. More actors only help while acting is slower than learning. The log
+# lines show steps and updates per second to check that.
+ACTOR_NUMBER = max(1, multiprocessing.cpu_count() - 1)
+
+# Same hyperparameters as in the serial example.
+MEMORY_LIMIT = 1000000
+WARMUP_STEPS = 50000
+GAMMA = .99
+BATCH_SIZE = 32
+TRAIN_INTERVAL = 4
+TARGET_MODEL_UPDATE = 10000
+CHECKPOINT_INTERVAL = 250000
+EPSILON_MAX = 1.
+EPSILON_MIN = .1
+
+# Transitions per message from an actor to the learner.
+CHUNK_LENGTH = 256
+
+# Updates of the learner between publishing the weights to the actors.
+SYNC_INTERVAL = 100
+
+# Steps between log lines.
+LOG_INTERVAL = 10000
+
+# A tiny configuration that runs the whole pipeline in about a minute with --smoke.
+SMOKE_ACTOR_NUMBER = 2
+SMOKE_STEPS = 4000
+SMOKE_WARMUP_STEPS = 1000
+SMOKE_INTERVAL = 1000
+
+
+class SharedWeights(object):
+    """
+    The weights of the learner in shared memory. The learner publishes them
+    and the actors load them when the version changed.
+    """
+
+    def __init__(self, context, weights):
+        self.shapes = [weight.shape for weight in weights]
+        self.sizes = [weight.size for weight in weights]
+        self._array = context.RawArray("f", sum(self.sizes))
+        self._lock = context.Lock()
+        self._version = context.RawValue("q", 0)
+        self.publish(weights)
+
+    def publish(self, weights):
+        """
+        Writes new weights.
+        """
+        array = np.frombuffer(self._array, dtype=np.float32)
+        with self._lock:
+            array[:] = np.concatenate([weight.ravel() for weight in weights])
+            self._version.value += 1
+
+    def load(self, model, version):
+        """
+        Sets the weights of the model if they are newer than version. Yields
+        the version of the weights of the model.
+        """
+        if self._version.value == version:
+            return version
+        array = np.frombuffer(self._array, dtype=np.float32)
+        with self._lock:
+            flat = array.copy()
+            version = self._version.value
+        weights = np.split(flat, np.cumsum(self.sizes)[:-1])
+        model.set_weights([weight.reshape(shape) for weight, shape in zip(weights, self.shapes)])
+        return version
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Trains a double DQN with parallel actors.")
+    parser.add_argument("--smoke", action="store_true", help="Run a tiny configuration to check that everything works.")
+    arguments = parser.parse_args()
+
+    # The full configuration or the tiny one. Intervals shrink with the steps.
+    actor_number, steps_total, warmup_steps = ACTOR_NUMBER, STEPS, WARMUP_STEPS
+    target_model_update, checkpoint_interval, log_interval = TARGET_MODEL_UPDATE, CHECKPOINT_INTERVAL, LOG_INTERVAL
+    weights_prefix = "dqn"
+    if arguments.smoke:
+        actor_number, steps_total, warmup_steps = SMOKE_ACTOR_NUMBER, SMOKE_STEPS, SMOKE_WARMUP_STEPS
+        target_model_update, checkpoint_interval, log_interval = SMOKE_INTERVAL, SMOKE_INTERVAL, SMOKE_INTERVAL
+        weights_prefix = "smoke_dqn"
+    epsilon_steps = int(steps_total * 0.8)
+
+    environment_name = "lawnmower-medium-obstacles-v0"
+    context = multiprocessing.get_context("spawn")
+
+    # Build the model of the learner and its target model.
+    nb_actions = gym.make(environment_name).action_space.n
+    input_shape = (WINDOW_LENGTH,) + INPUT_SHAPE
+    model = build_model_cnn(input_shape, nb_actions)
+    target_model = build_model_cnn(input_shape, nb_actions)
+    target_model.set_weights(model.get_weights())
+    model.compile(optimizers.Adam(lr=.00025), loss=lambda y_true, y_pred: backend.sum(huber_loss(y_true, y_pred, 1.), axis=-1))
+    print(model.summary())
+
+    # State that is shared with the actors.
+    shared_weights = SharedWeights(context, model.get_weights())
+    shared_steps = context.RawValue("q", 0)
+    stop = context.Event()
+    transition_queue = context.Queue(maxsize=4 * actor_number)
+
+    # Start the actors.
+    actors = []
+    for actor_index in range(actor_number):
+        actor = context.Process(target=run_actor, args=(actor_index, environment_name, shared_weights, shared_steps, stop, transition_queue, epsilon_steps), daemon=True)
+        actor.start()
+        actors.append(actor)
+
+    # Every actor fills a memory of its own, so windows never mix actors.
+    memories = [LawnmowerMemory(limit=MEMORY_LIMIT // actor_number, window_length=WINDOW_LENGTH, pack=True) for _ in range(actor_number)]
+    processor = LawnmowerProcessor()
+
+    # Train until enough steps have been taken and all of their updates are done.
+    steps = 0
+    updates = 0
+    episode_rewards = deque(maxlen=100)
+    start_time = time.time()
+    next_log = log_interval
+    next_checkpoint = checkpoint_interval
+    next_target_update = target_model_update
+    while steps < steps_total or updates < (steps - warmup_steps) // TRAIN_INTERVAL:
+
+        # Take the transitions of the actors once the updates caught up. Until then the actors wait for the learner.
+        behind = steps >= warmup_steps and updates < (steps - warmup_steps) // TRAIN_INTERVAL
+        chunks = [] if behind else receive(transition_queue, block=True)
+        for actor_index, observations, actions, rewards, terminals, finished_rewards in chunks:
+
+            # The last observations of episodes are stored but are no steps.
+            memory = memories[actor_index]
+            for transition in zip(observations, actions, rewards, terminals):
+                memory.append(*transition)
+            steps += len(actions) - len(finished_rewards)
+            episode_rewards.extend(finished_rewards)
+        shared_steps.value = steps
+
+        # Train with the same ratio of steps to updates as the serial example.
+        target_updates = (steps - warmup_steps) // TRAIN_INTERVAL
+        for _ in range(min(SYNC_INTERVAL, target_updates - updates)):
+            train(model, target_model, memories, processor)
+            updates += 1
+            if updates % SYNC_INTERVAL == 0:
+                shared_weights.publish(model.get_weights())
+
+        # The steps that the updates so far account for. The steps received ahead of the updates do not count yet.
+        trained_steps = min(steps, warmup_steps + updates * TRAIN_INTERVAL)
+
+        # Update the target model.
+        if trained_steps >= next_target_update:
+            target_model.set_weights(model.get_weights())
+            next_target_update += target_model_update
+
+        # Save the weights like the ModelIntervalCheckpoint does.
+        if trained_steps >= next_checkpoint:
+            model.save_weights("{}_{}_weights_{}.h5f".format(weights_prefix, environment_name, next_checkpoint), overwrite=True)
+            next_checkpoint += checkpoint_interval
+
+        # Log once, even if several intervals were received at once.
+        if steps >= next_log:
+            duration = time.time() - start_time
+            mean_reward = np.mean(episode_rewards) if len(episode_rewards) > 0 else float("nan")
+            print("Step {}, {} updates, {:.0f} steps/s, {:.0f} updates/s, mean episode reward {:.2f}".format(steps, updates, steps / duration, updates / duration, mean_reward))
+            while next_log <= steps:
+                next_log += log_interval
+
+    # Stop the actors. Empty the queue so that no actor is stuck.
+    stop.set()
+    while any(actor.is_alive() for actor in actors):
+        for _ in receive(transition_queue, block=False):
+            pass
+        time.sleep(0.1)
+    for actor in actors:
+        actor.join()
+
+    # Save the final network after training.
+    weights_filename = "{}_{}_weights.h5f".format(weights_prefix, environment_name)
+    model.save_weights(weights_filename, overwrite=True)
+
+
+def receive(transition_queue, block):
+    """
+    Yields all chunks that are in the queue. Optionally waits for the first.
+    """
+    chunks = []
+    try:
+        if block:
+            chunks.append(transition_queue.get(timeout=1.))
+        while True:
+            chunks.append(transition_queue.get_nowait())
+    except queue.Empty:
+        pass
+    return chunks
+
+
+def train(model, target_model, memories, processor):
+    """
+    Performs one double DQN update on a batch from all memories. Every
+    memory contributes in proportion to its entries.
+    """
+    entries = np.array([memory.nb_entries if memory.nb_entries >= WINDOW_LENGTH + 2 else 0 for memory in memories])
+    counts = np.random.multinomial(BATCH_SIZE, entries / entries.sum())
+    batches = [memory.sample_batch(count) for memory, count in zip(memories, counts) if count > 0]
+    state0, actions, rewards, state1, terminal1 = [np.concatenate(arrays) for arrays in zip(*batches)]
+    state0 = processor.process_state_batch(state0)
+    state1 = processor.process_state_batch(state1)
+
+    # The model selects the next actions and the target model rates them.
+    next_actions = np.argmax(model.predict_on_batch(state1), axis=1)
+    next_q_values = target_model.predict_on_batch(state1)[np.arange(BATCH_SIZE), next_actions]
+
+    # Only the taken actions have a loss.
+    targets = model.predict_on_batch(state0)
+    targets[np.arange(BATCH_SIZE), actions] = rewards + GAMMA * next_q_values * (1. - terminal1)
+    model.train_on_batch(state0, targets)
+
+
+def run_actor(actor_index, environment_name, shared_weights, shared_steps, stop, transition_queue, epsilon_steps):
+    """
+    Runs an environment with a copy of the model of the learner and sends
+    the transitions to the learner. Explores epsilon-greedy, with epsilon
+    annealed over epsilon_steps steps of all actors.
+    """
+    environment = gym.make(environment_name)
+    environment.seed(actor_index)
+    nb_actions = environment.action_space.n
+    model = build_model_cnn((WINDOW_LENGTH,) + INPUT_SHAPE, nb_actions)
+    version = shared_weights.load(model, -1)
+    processor = LawnmowerProcessor()
+    random = np.random.default_rng(actor_index)
+
+    # The transitions in the order of the memory of keras-rl.
+    observations, actions, rewards, terminals = [], [], [], []
+    finished_rewards = []
+
+    # The window starts with zeros.
+    observation = processor.process_observation(environment.reset())
+    window = deque([np.zeros_like(observation)] * (WINDOW_LENGTH - 1) + [observation], maxlen=WINDOW_LENGTH)
+    episode_reward = 0.
+    while not stop.is_set():
+
+        # Select an action.
+        epsilon = max(EPSILON_MIN, EPSILON_MAX - (EPSILON_MAX - EPSILON_MIN) * shared_steps.value / epsilon_steps)
+        if random.random() < epsilon:
+            action = int(random.integers(nb_actions))
+        else:
+            q_values = model.predict_on_batch(processor.process_state_batch(np.array(window)[np.newaxis]))
+            action = int(np.argmax(q_values[0]))
+
+        next_observation, reward, done, _ = environment.step(action)
+        reward = processor.process_reward(reward)
+        observations.append(observation)
+        actions.append(action)
+        rewards.append(reward)
+        terminals.append(done)
+        episode_reward += reward
+        observation = processor.process_observation(next_observation)
+        window.append(observation)
+
+        # Like keras-rl, store the last observation of an episode too.
+        if done:
+            observations.append(observation)
+            actions.append(0)
+            rewards.append(0.)
+            terminals.append(False)
+            finished_rewards.append(episode_reward)
+            observation = processor.process_observation(environment.reset())
+            window.extend([np.zeros_like(observation)] * (WINDOW_LENGTH - 1) + [observation])
+            episode_reward = 0.
+
+        # Send a chunk and fetch the newest weights.
+        if len(actions) >= CHUNK_LENGTH:
+            chunk = (actor_index, np.array(observations, dtype=np.uint8), np.array(actions), np.array(rewards, dtype=np.float32), np.array(terminals), finished_rewards)
+            while not stop.is_set():
+                try:
+                    transition_queue.put(chunk, timeout=1.)
+                    break
+                except queue.Full:
+                    pass
+            observations, actions, rewards, terminals = [], [], [], []
+            finished_rewards = []
+            version = shared_weights.load(model, version)
+
+
+if __name__ == "__main__":
+    main()
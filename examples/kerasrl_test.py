@@ -52,7 +52,7 @@ def main():
     weights_filename = sys.argv[1]
     dqn.load_weights(weights_filename)
 
-    # Test the agent.
+    # Test the agent. For statistics over many episodes use kerasrl_evaluate.py.
     dqn.test(environment, nb_episodes=10, visualize=True)
 
 
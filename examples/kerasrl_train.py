@@ -6,7 +6,6 @@ import gym_lawnmower
 from keras import models, layers, optimizers
 from rl.agents.dqn import DQNAgent
 from rl.policy import LinearAnnealedPolicy, BoltzmannQPolicy, EpsGreedyQPolicy
-from rl.memory import SequentialMemory
 from rl.core import Processor
 from rl.callbacks import FileLogger, ModelIntervalCheckpoint
 from kerasrl_extensions import *
@@ -63,8 +62,8 @@ def main():
     model = build_model_cnn((WINDOW_LENGTH,) + INPUT_SHAPE, nb_actions)
     print(model.summary())
 
-    # Create sequential memory for memory replay.
-    memory = SequentialMemory(limit=1000000, window_length=WINDOW_LENGTH)
+    # Create compact memory for memory replay. Packs every cell into 3 bits.
+    memory = LawnmowerMemory(limit=1000000, window_length=WINDOW_LENGTH, pack=True)
 
     # Process environment inputs and outputs.
     processor = LawnmowerProcessor()
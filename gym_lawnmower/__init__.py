@@ -77,3 +77,69 @@ register(
     entry_point='gym_lawnmower.envs:LawnmowerEnv',
     kwargs=kwargs
 )
+
+# A huge map for scaling experiments. No obstacles. The mower only sees its
+# surroundings and only the area around it is rendered, so a step costs the
+# same as on the small maps.
+kwargs = {
+    "width": 256,
+    "height": 256,
+    "obstacle_number": 0,
+    "max_steps": 200000,
+    "observation_type": "window",
+    "window_size": 15,
+    "render_viewport": (17, 17),
+}
+register(
+    id="lawnmower-huge-v0",
+    entry_point='gym_lawnmower.envs:LawnmowerEnv',
+    kwargs=kwargs
+)
+
+# A huge map for scaling experiments. Some random obstacles.
+kwargs = {
+    "width": 256,
+    "height": 256,
+    "obstacle_number": 2048,
+    "max_steps": 200000,
+    "observation_type": "window",
+    "window_size": 15,
+    "render_viewport": (17, 17),
+}
+register(
+    id="lawnmower-huge-obstacles-v0",
+    entry_point='gym_lawnmower.envs:LawnmowerEnv',
+    kwargs=kwargs
+)
+
+# A giant map for scaling experiments. No obstacles.
+kwargs = {
+    "width": 1024,
+    "height": 1024,
+    "obstacle_number": 0,
+    "max_steps": 3000000,
+    "observation_type": "window",
+    "window_size": 15,
+    "render_viewport": (17, 17),
+}
+register(
+    id="lawnmower-giant-v0",
+    entry_point='gym_lawnmower.envs:LawnmowerEnv',
+    kwargs=kwargs
+)
+
+# A giant map for scaling experiments. Some random obstacles.
+kwargs = {
+    "width": 1024,
+    "height": 1024,
+    "obstacle_number": 32768,
+    "max_steps": 3000000,
+    "observation_type": "window",
+    "window_size": 15,
+    "render_viewport": (17, 17),
+}
+register(
+    id="lawnmower-giant-obstacles-v0",
+    entry_point='gym_lawnmower.envs:LawnmowerEnv',
+    kwargs=kwargs
+)
@@ -1 +1,6 @@
 from gym_lawnmower.envs.lawnmower_env import LawnmowerEnv
+from gym_lawnmower.envs.lawnmower_vector_env import LawnmowerVectorEnv
+from gym_lawnmower.envs.lawnmower_subproc_env import LawnmowerSubprocVectorEnv
+from gym_lawnmower.envs.lawnmower_frame_stack import LawnmowerFrameStack
+from gym_lawnmower.envs.lawnmower_multi_env import LawnmowerMultiEnv
+from gym_lawnmower.envs.lawnmower_recorder import LawnmowerRecorder, LawnmowerDataset
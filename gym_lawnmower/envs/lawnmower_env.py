@@ -1,10 +1,11 @@
 import os
+import collections
 import gym
 from gym import error, spaces, utils
 from gym.utils import seeding
-import pygame
 import numpy as np
-import random
+from gym_lawnmower.envs.lawnmower_layouts import load_layouts
+from gym_lawnmower.envs.lawnmower_profiler import LawnmowerProfilingMixin
 
 
 # Indices for grid.
@@ -26,6 +27,9 @@ ACTION_INDEX_RIGHT = 2
 ACTION_INDICES = [ACTION_INDEX_FORWARD, ACTION_INDEX_LEFT, ACTION_INDEX_RIGHT]
 ACTION_INDEX_MAX = max(ACTION_INDICES)
 
+# Index of the first macro action. Macro actions follow the basic actions.
+ACTION_INDEX_FORWARD_UNTIL_BLOCKED = ACTION_INDEX_MAX + 1
+
 # Orientations.
 ORIENTATION_INDEX_UP = 0
 ORIENTATION_INDEX_RIGHT = 1
@@ -42,6 +46,14 @@ orientation_to_grid = {
     ORIENTATION_INDEX_LEFT: GRID_INDEX_MOWER_LEFT,
 }
 
+# Mapping orientations to the movement in x and y.
+orientation_to_delta = {
+    ORIENTATION_INDEX_UP: (0, -1),
+    ORIENTATION_INDEX_RIGHT: (1, 0),
+    ORIENTATION_INDEX_DOWN: (0, 1),
+    ORIENTATION_INDEX_LEFT: (-1, 0),
+}
+
 # Mapping grid to characters.
 grid_to_character = {
     GRID_INDEX_GRASS: ".",
@@ -55,45 +67,285 @@ grid_to_character = {
 
 TILE_SIZE = 64
 
-def load_image(filename):
+def load_image(filename, tile_size=TILE_SIZE):
+    import pygame
     root_path = os.path.abspath(os.path.dirname(__file__))
     image_path = os.path.join(root_path, "resources", filename)
     image = pygame.image.load(image_path)
-    image = pygame.transform.scale(image, [TILE_SIZE, TILE_SIZE])
+    image = pygame.transform.scale(image, [tile_size, tile_size])
     return image
 
-# Mapping grid to image.
-grid_to_image = {
-    GRID_INDEX_GRASS: load_image("Grass.png"),
-    GRID_INDEX_MOWED: load_image("Mowed.png"),
-    GRID_INDEX_OBSTACLE: load_image("Obstacle.png"),
-    GRID_INDEX_MOWER_UP: load_image("MowerUp.png"),
-    GRID_INDEX_MOWER_RIGHT: load_image("MowerRight.png"),
-    GRID_INDEX_MOWER_DOWN: load_image("MowerDown.png"),
-    GRID_INDEX_MOWER_LEFT: load_image("MowerLeft.png"),
+# Mapping grid to image file.
+grid_to_image_filename = {
+    GRID_INDEX_GRASS: "Grass.png",
+    GRID_INDEX_MOWED: "Mowed.png",
+    GRID_INDEX_OBSTACLE: "Obstacle.png",
+    GRID_INDEX_MOWER_UP: "MowerUp.png",
+    GRID_INDEX_MOWER_RIGHT: "MowerRight.png",
+    GRID_INDEX_MOWER_DOWN: "MowerDown.png",
+    GRID_INDEX_MOWER_LEFT: "MowerLeft.png",
 }
 
+# Mapping grid to image and tile atlases, per tile size. Loaded on first use,
+# because headless runs never need them.
+_grid_to_image = {}
+_tile_atlas = {}
+
+def get_grid_to_image(tile_size=TILE_SIZE):
+    """
+    Yields the mapping from grid to image. Imports pygame and loads the images
+    only the first time it is called.
+    """
+    if tile_size not in _grid_to_image:
+        _grid_to_image[tile_size] = {index: load_image(filename, tile_size) for index, filename in grid_to_image_filename.items()}
+    return _grid_to_image[tile_size]
+
+def get_tile_atlas(tile_size=TILE_SIZE):
+    """
+    Yields all images as one uint8 array with the shape
+    (GRID_INDEX_MAX + 1, tile_size, tile_size, 3). The first axis is the grid
+    index, the others are rows, columns and RGB.
+    """
+    if tile_size not in _tile_atlas:
+        import pygame
+        grid_to_image = get_grid_to_image(tile_size)
+        tile_atlas = np.zeros((GRID_INDEX_MAX + 1, tile_size, tile_size, 3), dtype=np.uint8)
+        for index in GRID_INDICES:
+            tile_atlas[index] = pygame.surfarray.array3d(grid_to_image[index]).transpose(1, 0, 2)
+        tile_atlas.flags.writeable = False
+        _tile_atlas[tile_size] = tile_atlas
+    return _tile_atlas[tile_size]
+
+def render_rgb_array(grid, tile_size=TILE_SIZE):
+    """
+    Renders a grid with one gather from the tile atlas. No display needed.
+    Yields an RGB array with the shape (height * tile_size, width * tile_size, 3).
+    """
+    tile_atlas = get_tile_atlas(tile_size)
+    width, height = grid.shape
+
+    # Rows of tiles are y, columns of tiles are x.
+    tiles = tile_atlas[grid.T]
+    return tiles.transpose(0, 2, 1, 3, 4).reshape(height * tile_size, width * tile_size, 3)
+
+# Connects cells to their four neighbours in the same grid of a batch.
+_LABEL_STRUCTURE = np.zeros((3, 3, 3), dtype=bool)
+_LABEL_STRUCTURE[1, 1, :] = True
+_LABEL_STRUCTURE[1, :, 1] = True
+
+# scipy is imported on first use, so that importing the package stays fast.
+_ndimage = None
+
+def _get_ndimage():
+    global _ndimage
+    if _ndimage is None:
+        from scipy import ndimage
+        _ndimage = ndimage
+    return _ndimage
+
+def compute_reachable(grids, mower_x, mower_y):
+    """
+    Flood-fills a batch of grids with the shape (number, width, height) from
+    the mowers. Yields a boolean mask of all cells the mowers can reach.
+    Labels the connected cells with scipy, which is linear in the grid size.
+    """
+    free = grids != GRID_INDEX_OBSTACLE
+    labels, _ = _get_ndimage().label(free, structure=_LABEL_STRUCTURE)
+    mower_labels = labels[np.arange(len(grids)), mower_x, mower_y]
+    return labels == mower_labels[:, np.newaxis, np.newaxis]
+
+def split_grass(grids, mower_x, mower_y, grass_count):
+    """
+    Splits the grass of a batch of grids into the grass that the mowers can
+    reach and the rest. The mower positions have the shape (number,), or
+    (number, mowers) for several mowers per grid. Yields the reachable and
+    the unreachable grass counts and a mask of the grids where the mowers
+    are walled in. Those grids cannot be won and have to be generated again.
+    """
+    mower_x = np.asarray(mower_x).reshape(len(grids), -1)
+    mower_y = np.asarray(mower_y).reshape(len(grids), -1)
+    reachable = compute_reachable(grids, mower_x[:, 0], mower_y[:, 0])
+    for mower in range(1, mower_x.shape[1]):
+        reachable |= compute_reachable(grids, mower_x[:, mower], mower_y[:, mower])
+    reachable_grass_count = np.count_nonzero(reachable & (grids == GRID_INDEX_GRASS), axis=(1, 2))
+    unreachable_grass_count = grass_count - reachable_grass_count
+    walled_in = (reachable_grass_count == 0) & (unreachable_grass_count > 0)
+    return reachable_grass_count, unreachable_grass_count, walled_in
+
+# The kwargs that describe a lawn. Registered environments may add kwargs that
+# only the LawnmowerEnv takes, like the observation type.
+LAWN_KWARGS = ["width", "height", "obstacle_number", "max_steps"]
+
+def get_lawn_kwargs(environment_id):
+    """
+    Yields the kwargs of a registered environment that describe the lawn.
+    """
+    spec = gym.spec(environment_id)
+
+    # Before gym 0.22 the kwargs of a spec are private.
+    kwargs = spec.kwargs if hasattr(spec, "kwargs") else spec._kwargs
+    return {key: value for key, value in kwargs.items() if key in LAWN_KWARGS}
+
+class LawnmowerSeedingMixin(object):
+    """
+    Gives an environment its own stream of random numbers in np_random.
+    """
+
+    def seed(self, seed=None):
+        """
+        Seeds the random number generator of the environment. The seed can be
+        an int, a numpy SeedSequence (for example one spawned for a worker) or
+        None for fresh entropy.
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.np_random = np.random.default_rng(seed)
+        return [seed.entropy]
+
+# Everything that is needed to continue a simulation from a certain point.
+LawnmowerState = collections.namedtuple("LawnmowerState", [
+    "grid",
+    "mower_position",
+    "mower_orientation",
+    "current_step",
+    "turn_count",
+    "grass_count",
+    "unreachable_grass_count",
+    "reachable_grass_count",
+    "regrowth_events",
+], defaults=[None])
+
 # Rewards.
 REWARD_EXCEEDED = -100
 REWARD_STEP = -1
 REWARD_NOT_MOWED = -1
+REWARD_NOT_MOWED_SAME_CELL = -1
 REWARD_TOO_MANY_TURNS = -10
 REWARD_MOWED = 10
 REWARD_ALL_MOWED = 100
 REWARD_OBSTACLE_COLLISION = -100
 
-class LawnmowerEnv(gym.Env):
+# Observation modes.
+OBSERVATION_MODE_COPY = "copy"
+OBSERVATION_MODE_VIEW = "view"
+OBSERVATION_MODE_BUFFER = "buffer"
+OBSERVATION_MODES = [OBSERVATION_MODE_COPY, OBSERVATION_MODE_VIEW, OBSERVATION_MODE_BUFFER]
+
+# Observation types.
+OBSERVATION_TYPE_GRID = "grid"
+OBSERVATION_TYPE_PLANES = "planes"
+OBSERVATION_TYPE_WINDOW = "window"
+OBSERVATION_TYPES = [OBSERVATION_TYPE_GRID, OBSERVATION_TYPE_PLANES, OBSERVATION_TYPE_WINDOW]
+
+# How often a window has to be rotated by 90 degrees so that the mower faces up.
+orientation_to_window_rotations = {
+    ORIENTATION_INDEX_UP: 0,
+    ORIENTATION_INDEX_RIGHT: 3,
+    ORIENTATION_INDEX_DOWN: 2,
+    ORIENTATION_INDEX_LEFT: 1,
+}
+
+# Indices for feature planes.
+PLANE_INDEX_GRASS = 0
+PLANE_INDEX_MOWED = 1
+PLANE_INDEX_OBSTACLE = 2
+PLANE_INDEX_MOWER = 3
+PLANE_INDEX_MOWER_UP = 4
+PLANE_INDEX_MOWER_RIGHT = 5
+PLANE_INDEX_MOWER_DOWN = 6
+PLANE_INDEX_MOWER_LEFT = 7
+PLANE_NUMBER = 8
+
+# Mapping grid to feature planes. Every row holds the planes of one grid index.
+GRID_TO_PLANES = np.zeros((GRID_INDEX_MAX + 1, PLANE_NUMBER), dtype=np.uint8)
+GRID_TO_PLANES[GRID_INDEX_GRASS, PLANE_INDEX_GRASS] = 1
+GRID_TO_PLANES[GRID_INDEX_MOWED, PLANE_INDEX_MOWED] = 1
+GRID_TO_PLANES[GRID_INDEX_OBSTACLE, PLANE_INDEX_OBSTACLE] = 1
+GRID_TO_PLANES[GRID_INDICES_MOWER, PLANE_INDEX_MOWER] = 1
+GRID_TO_PLANES[GRID_INDEX_MOWER_UP, PLANE_INDEX_MOWER_UP] = 1
+GRID_TO_PLANES[GRID_INDEX_MOWER_RIGHT, PLANE_INDEX_MOWER_RIGHT] = 1
+GRID_TO_PLANES[GRID_INDEX_MOWER_DOWN, PLANE_INDEX_MOWER_DOWN] = 1
+GRID_TO_PLANES[GRID_INDEX_MOWER_LEFT, PLANE_INDEX_MOWER_LEFT] = 1
+
+def pack_planes(planes):
+    """
+    Packs feature planes, or a batch of them, into bits for compact storage.
+    The last axes (PLANE_NUMBER, width, height) become one axis of bytes.
+    """
+    planes = np.asarray(planes)
+    batch_shape = planes.shape[:-3]
+    return np.packbits(planes.reshape(batch_shape + (-1,)), axis=-1)
+
+def unpack_planes(packed, width, height):
+    """
+    Unpacks bits that were packed with pack_planes.
+    """
+    packed = np.asarray(packed)
+    batch_shape = packed.shape[:-1]
+    size = PLANE_NUMBER * width * height
+    planes = np.unpackbits(packed, axis=-1, count=size)
+    return planes.reshape(batch_shape + (PLANE_NUMBER, width, height))
+
+class LawnmowerEnv(LawnmowerSeedingMixin, LawnmowerProfilingMixin, gym.Env):
     """
     The lawnmower environment is a rectangular grid. The size is customizable.
     The border of the grid consists of obstacles. On  top of that other cells
     can be obstacles too. Everything else is mostly grass. If the robot steps
     on a cell with grass, the grass is mowed. If the robot hits an obstacle, the
     robot is damaged beyond repair.
+
+    The observation mode decides who owns the returned grids:
+    - "copy": Every observation is a fresh copy that belongs to the caller.
+    - "view": Every observation is a read-only view of the environment's grid.
+      The environment owns it. It changes with the next step and reset. Copy
+      it if you need to keep it.
+    - "buffer": Every observation is written into the next frame of a ring
+      buffer with the shape (length, width, height) and the frame is returned.
+      A frame stays valid for length - 1 further steps and resets. The buffer
+      is either provided by the caller, who keeps owning it, or preallocated
+      by the environment with observation_buffer_length frames.
+
+    The observation type decides what is observed:
+    - "grid": The grid with the shape (width, height) and the grid indices.
+    - "planes": Channel-first feature planes with the shape
+      (PLANE_NUMBER, width, height) and values 0 and 1. There are planes for
+      grass, mowed grass, obstacles, the mower and one per mower orientation.
+      The planes are updated only where the grid changed. Use pack_planes to
+      store them with one bit per value.
+    - "window": Fog of war. The grid cells around the mower with the shape
+      (window_size, window_size). Cells outside of the grid are obstacles. With
+      window_rotation the window is rotated so that the mower faces up. The
+      grid lives inside a padded grid and the windows are strided views of it,
+      so nothing is copied to build them.
+
+    With regrowth_delay, mowed grass grows back after that many steps, or
+    after a random number of steps if it is a (minimum, maximum) tuple. The
+    task becomes patrolling instead of covering: mowing everything does not
+    end the episode. Pending regrowths live in a timer wheel with one bucket
+    per step, so a step only touches the cells that are due.
+
+    With macro_actions, more actions follow the basic ones. Action 3 moves
+    forward until the cell ahead is not grass, but at least once. The actions
+    after it move forward by the lengths in forward_lengths. With
+    action_repeat, every basic action is performed that many times. Extended
+    actions run inside the environment, return the summed reward, stop early
+    on collision, completion or max_steps and report the number of basic
+    steps as info["basic_steps"]. Every basic step counts towards max_steps.
+
+    With profiling, calls and time of the phases and the episodes by
+    done_reason are counted. See get_stats. Without it nothing is measured.
+
+    With grid_buffer, the grid lives in that uint8 array of the shape
+    (width, height), for example in shared memory. The caller keeps owning it.
     """
 
-    metadata = {"render.modes": ["window", "console"]}
+    metadata = {"render.modes": ["window", "console", "rgb_array"]}
+
+    # Methods that are timed when profiling. Steps are always timed.
+    PROFILED_PHASES = ["_perform_action", "_get_observation", "reset", "render"]
 
-    def __init__(self, width, height, obstacle_number, max_steps):
+    def __init__(self, width, height, obstacle_number, max_steps, debug=False, observation_mode=OBSERVATION_MODE_COPY, observation_buffer=None, observation_buffer_length=2, observation_type=OBSERVATION_TYPE_GRID, window_size=5, window_rotation=False, tile_size=TILE_SIZE, render_viewport=None, layout_file=None, layout_sequential=False, check_reachability=True, regrowth_delay=None, macro_actions=False, forward_lengths=(2, 4), action_repeat=1, profiling=False, grid_buffer=None):
 
         # Parameters.
         self.width = width
@@ -101,13 +353,98 @@ class LawnmowerEnv(gym.Env):
         self.obstacle_number = obstacle_number
         self.max_steps = max_steps
 
-        # Observation space.
-        self.observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.width, self.height), dtype=np.uint8), # Target image.
-
-        # Action space.
-        self.action_space = spaces.Discrete(ACTION_INDEX_MAX + 1)
+        # The mower and the obstacles have to fit inside the border.
+        self._inner_size = (self.width - 2) * (self.height - 2)
+        assert self.obstacle_number < self._inner_size, "{} obstacles do not fit into {} inner cells next to the mower.".format(self.obstacle_number, self._inner_size)
+
+        # In debug mode the incremental grass counter is checked against the grid.
+        self.debug = debug
+
+        # Grass that is walled off by obstacles does not count towards the goal.
+        self.check_reachability = check_reachability
+
+        # The grid is created on the first reset, unless the caller provides
+        # the array it lives in.
+        self.grid = None
+        if grid_buffer is not None:
+            assert observation_type != OBSERVATION_TYPE_WINDOW, "Windows need a grid of their own."
+            assert grid_buffer.dtype == np.uint8, str(grid_buffer.dtype)
+            assert grid_buffer.shape == (self.width, self.height), str(grid_buffer.shape)
+            self.grid = grid_buffer
+
+        # Optionally let the grass regrow.
+        self.regrowth_delay = regrowth_delay
+        self._regrowth_wheel = None
+        if self.regrowth_delay is not None:
+            if isinstance(self.regrowth_delay, int):
+                self.regrowth_delay = (self.regrowth_delay, self.regrowth_delay)
+            assert 1 <= self.regrowth_delay[0] <= self.regrowth_delay[1], str(regrowth_delay)
+            self._regrowth_wheel = [[] for _ in range(self.regrowth_delay[1] + 1)]
+            self._regrowth_due = np.full((self.width, self.height), -1, dtype=np.int64)
+
+        # What is observed.
+        assert observation_type in OBSERVATION_TYPES, str(observation_type)
+        self.observation_type = observation_type
+        self.planes = None
+        if self.observation_type == OBSERVATION_TYPE_PLANES:
+            self.planes = np.zeros((PLANE_NUMBER, self.width, self.height), dtype=np.uint8)
+            self.observation_space = spaces.Box(low=0, high=1, shape=self.planes.shape, dtype=np.uint8)
+        elif self.observation_type == OBSERVATION_TYPE_WINDOW:
+            assert window_size % 2 == 1, "The window size has to be odd, got {}.".format(window_size)
+            self.window_size = window_size
+            self.window_rotation = window_rotation
+            self._create_windows()
+            self.observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.window_size, self.window_size), dtype=np.uint8)
+        else:
+            self.observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.width, self.height), dtype=np.uint8)
+
+        # How observations are handed out.
+        assert observation_mode in OBSERVATION_MODES, str(observation_mode)
+        self.observation_mode = observation_mode
+        self._observation_buffer = None
+        self._observation_frames = None
+        self._observation_buffer_index = 0
+        self._observation_view = None
+        self._observation_source = None
+        if self.observation_mode == OBSERVATION_MODE_BUFFER:
+            if observation_buffer is None:
+                observation_buffer = np.zeros((observation_buffer_length,) + self.observation_space.shape, dtype=np.uint8)
+            assert observation_buffer.dtype == np.uint8, str(observation_buffer.dtype)
+            assert observation_buffer.shape[1:] == self.observation_space.shape, str(observation_buffer.shape)
+            self._observation_buffer = observation_buffer
+            self._observation_frames = list(observation_buffer)
+
+        # Action space. Optionally with macro actions.
+        self.macro_actions = macro_actions
+        self.forward_lengths = tuple(forward_lengths) if macro_actions else ()
+        assert action_repeat >= 1, str(action_repeat)
+        self.action_repeat = action_repeat
+        action_number = ACTION_INDEX_MAX + 1
+        if self.macro_actions:
+            action_number += 1 + len(self.forward_lengths)
+        self.action_space = spaces.Discrete(action_number)
+
+        # Every environment has its own stream of random numbers.
+        self.seed()
+
+        # Optionally reset to stored layouts instead of generating them.
+        self.layouts = None
+        self.layout_sequential = layout_sequential
+        self._layout_index = 0
+        if layout_file is not None:
+            self.layouts = load_layouts(layout_file, self.width, self.height)
+
+        # Expands states for planning. Created on first use.
+        self._expander = None
+
+        # Optional instrumentation.
+        self.profiler = None
+        if profiling:
+            self.enable_profiling()
 
         # Prepare for pygame.
+        self.tile_size = tile_size
+        self.render_viewport = render_viewport
         self._pygame_screen = None
 
     def print_description(self):
@@ -129,24 +466,69 @@ class LawnmowerEnv(gym.Env):
         """
         # The environment should be reset at the beginning.
         assert self._reset == True, "Did you reset the environment?"
+        assert 0 <= action < self.action_space.n, str(action)
 
+        # A single basic action.
+        if action <= ACTION_INDEX_MAX and self.action_repeat == 1:
+            reward, done, info = self._perform_step(action)
+
+        # Extended actions are repeated basic actions.
+        else:
+            basic_action = action
+            repetitions = self.action_repeat
+            until_blocked = False
+            if action == ACTION_INDEX_FORWARD_UNTIL_BLOCKED:
+                basic_action = ACTION_INDEX_FORWARD
+                repetitions = self.max_steps
+                until_blocked = True
+            elif action > ACTION_INDEX_FORWARD_UNTIL_BLOCKED:
+                basic_action = ACTION_INDEX_FORWARD
+                repetitions = self.forward_lengths[action - ACTION_INDEX_FORWARD_UNTIL_BLOCKED - 1]
+
+            reward = 0
+            for repetition in range(repetitions):
+                basic_reward, done, info = self._perform_step(basic_action)
+                reward += basic_reward
+                if done or (until_blocked and self._get_cell_ahead() != GRID_INDEX_GRASS):
+                    break
+            info["basic_steps"] = repetition + 1
+
+        # Done for now.
+        observation = self._get_observation()
+        return observation, reward, done, info
+
+    def _perform_step(self, action):
+        """
+        Performs one basic step of the simulation without observing.
+        """
         # Count the steps.
         self.current_step += 1
 
         # Terminate the simulation if the number of steps has been exceeded.
         if self.current_step == self.max_steps:
-            observation = self._get_observation()
             reward = REWARD_EXCEEDED
             done = True
             info = { "done_reason" : "Steps exceeded." }
 
         # Do a normal simulation step.
         else :
+            if self._regrowth_wheel is not None:
+                self._regrow()
+            old_position = self.mower_position
             reward, done, info = self._perform_action(action)
-            observation = self._get_observation()
+            if self.planes is not None:
+                self._update_planes(old_position)
+                self._update_planes(self.mower_position)
 
-        # Done for now.
-        return observation, reward, done, info
+        return reward, done, info
+
+    def _get_cell_ahead(self):
+        """
+        Yields the grid index of the cell in front of the mower.
+        """
+        x, y = self.mower_position
+        delta_x, delta_y = orientation_to_delta[self.mower_orientation]
+        return self.grid[x + delta_x, y + delta_y]
 
     def _perform_action(self, action):
         """
@@ -178,10 +560,15 @@ class LawnmowerEnv(gym.Env):
                 self.grid[old_x, old_y] = GRID_INDEX_MOWED
                 self.grid[new_x, new_y] = orientation_to_grid[self.mower_orientation]
                 self.mower_position = (new_x, new_y)
+                if self._regrowth_wheel is not None:
+                    self._schedule_regrowth(old_x, old_y)
 
-                # Count unmowed grass on the whole grid.
-                zero_count = self.width * self.height - np.count_nonzero(self.grid)
-                all_mowed = zero_count == 0
+                # Keep track of the unmowed grass.
+                if new_was_grass:
+                    self.grass_count -= 1
+                if self.debug:
+                    self._check_grass_count()
+                all_mowed = self.grass_count == 0 and self._regrowth_wheel is None
 
                 # The whole lawn has been mowed. Terminate and reward.
                 if new_was_grass and all_mowed:
@@ -238,11 +625,14 @@ class LawnmowerEnv(gym.Env):
         return reward, done, info
 
 
-    def reset(self):
+    def reset(self, seed=None):
         """
         Resets the entire environment. Should be called in the beginning and
-        everytime a simulation is over.
+        everytime a simulation is over. Reseeds the environment if a seed is
+        given.
         """
+        if seed is not None:
+            self.seed(seed)
 
         self._reset = True
 
@@ -252,48 +642,168 @@ class LawnmowerEnv(gym.Env):
         # Count turns.
         self.turn_count = 0
 
-        # Create an empty grid.
-        self.grid = np.zeros((self.width, self.height)).astype("uint8")
+        # Forget pending regrowths.
+        if self._regrowth_wheel is not None:
+            self._clear_regrowth()
+
+        # The grid is reused between episodes.
+        if self.grid is None:
+            self.grid = np.zeros((self.width, self.height), dtype=np.uint8)
+
+        # Take a stored layout or generate a new one.
+        if self.layouts is not None:
+            self._load_layout()
+        else:
+            self._generate_layout()
+        self._build_planes()
+
+        # Return the observation.
+        observation = self._get_observation()
+        return observation
+
+    def _generate_layout(self):
+        """
+        Generates random layouts until the mower is not walled in.
+        """
+        while True:
+            self._place_layout()
+            if not self.check_reachability or self.obstacle_number == 0:
+                break
+
+            # Only the grass the mower can reach has to be mowed.
+            x, y = self.mower_position
+            reachable_grass_count, unreachable_grass_count, walled_in = split_grass(self.grid[np.newaxis], [x], [y], self.grass_count)
+            self.grass_count = int(reachable_grass_count[0])
+            self.unreachable_grass_count = int(unreachable_grass_count[0])
+            if not walled_in[0]:
+                break
+
+        self.reachable_grass_count = self.grass_count
+
+    def _place_layout(self):
+        """
+        Places the mower and the obstacles randomly.
+        """
+        # Create an empty grid with a border.
+        self.grid[1:-1, 1:-1] = GRID_INDEX_GRASS
+        self.grid[[0, -1], :] = GRID_INDEX_OBSTACLE
+        self.grid[:, [0, -1]] = GRID_INDEX_OBSTACLE
+
+        # Pick distinct inner cells for the mower and the obstacles at once.
+        inner_height = self.height - 2
+        cells = self.np_random.choice(self._inner_size, self.obstacle_number + 1, replace=False)
+        cells_x, cells_y = np.divmod(cells, inner_height)
+        cells_x += 1
+        cells_y += 1
 
         # Add mower.
-        x, y = self._random_position()
+        x, y = int(cells_x[0]), int(cells_y[0])
         self.mower_position = (x, y)
-        self.mower_orientation = random.randint(0, ORIENTATION_INDEX_MAX)
+        self.mower_orientation = int(self.np_random.integers(0, ORIENTATION_INDEX_MAX + 1))
         self.grid[x, y] = orientation_to_grid[self.mower_orientation]
 
-        # Add border.
-        for x in [0, self.width - 1]:
-            for y in range(0, self.height):
-                self.grid[x, y] = GRID_INDEX_OBSTACLE
-        for y in [0, self.height - 1]:
-            for x in range(0, self.width):
-                self.grid[x, y] = GRID_INDEX_OBSTACLE
-
         # Add obstacles.
-        counter = 0
-        while counter < self.obstacle_number:
-            x, y = self._random_position()
-            if self.grid[x, y] == GRID_INDEX_GRASS:
-                self.grid[x, y] = GRID_INDEX_OBSTACLE
-                counter += 1
+        self.grid[cells_x[1:], cells_y[1:]] = GRID_INDEX_OBSTACLE
 
-        # Return the observation.
-        observation = self._get_observation()
-        return observation
+        # Count the unmowed grass once. Steps keep the counter up to date.
+        self.grass_count = self._inner_size - 1 - self.obstacle_number
+        self.unreachable_grass_count = 0
+
+    def _load_layout(self):
+        """
+        Copies a stored layout into the grid. Layouts are taken in order if
+        layout_sequential is set, randomly otherwise.
+        """
+        if self.layout_sequential:
+            layout = self.layouts[self._layout_index]
+            self._layout_index = (self._layout_index + 1) % len(self.layouts)
+        else:
+            layout = self.layouts[self.np_random.integers(0, len(self.layouts))]
+
+        self.grid[...] = layout["grid"]
+        self.mower_position = (int(layout["mower_x"]), int(layout["mower_y"]))
+        self.mower_orientation = int(layout["mower_orientation"])
+        self.grass_count = int(layout["grass_count"])
+        self.unreachable_grass_count = int(layout["unreachable_grass_count"])
+        self.reachable_grass_count = self.grass_count
+
+    def get_state(self):
+        """
+        Yields a snapshot of the simulation. The snapshot owns a copy of the
+        grid and is not affected by later steps.
+        """
+        assert self._reset == True, "Did you reset the environment?"
+        return LawnmowerState(
+            self.grid.copy(),
+            self.mower_position,
+            self.mower_orientation,
+            self.current_step,
+            self.turn_count,
+            self.grass_count,
+            self.unreachable_grass_count,
+            self.reachable_grass_count,
+            self._get_regrowth_events()
+        )
+
+    def set_state(self, state):
+        """
+        Continues the simulation from a snapshot. The grid is copied into the
+        grid of the environment, so the snapshot can be restored again.
+        """
+        if self.grid is None:
+            self.grid = np.zeros((self.width, self.height), dtype=np.uint8)
+        self.grid[...] = state.grid
+        self.mower_position = state.mower_position
+        self.mower_orientation = state.mower_orientation
+        self.current_step = state.current_step
+        self.turn_count = state.turn_count
+        self.grass_count = state.grass_count
+        self.unreachable_grass_count = state.unreachable_grass_count
+        self.reachable_grass_count = state.reachable_grass_count
+        if self._regrowth_wheel is not None:
+            self._clear_regrowth()
+            for x, y, due_step in state.regrowth_events or ():
+                self._regrowth_due[x, y] = due_step
+                self._regrowth_wheel[due_step % len(self._regrowth_wheel)].append((x, y, due_step))
+        self._build_planes()
+        self._reset = True
+
+    def expand(self, state=None):
+        """
+        Performs every action on a snapshot at once, the current state if none
+        is given. Yields the successor snapshots, rewards, dones and infos,
+        ordered by action index. The environment itself is not changed.
+        """
+        from gym_lawnmower.envs.lawnmower_vector_env import LawnmowerVectorEnv
+        assert self._regrowth_wheel is None, "Expanding does not support regrowth."
+
+        if state is None:
+            state = self.get_state()
+        if self._expander is None:
+            self._expander = LawnmowerVectorEnv(len(ACTION_INDICES), self.width, self.height, self.obstacle_number, self.max_steps, auto_reset=False)
+
+        for index in range(len(ACTION_INDICES)):
+            self._expander.set_state(index, state)
+        _, rewards, dones, infos = self._expander.step(ACTION_INDICES)
+        states = [self._expander.get_state(index) for index in range(len(ACTION_INDICES))]
+        return states, rewards, dones, infos
 
     def render(self, mode="window", close=False):
         """
-        Renders the grid.
+        Renders the grid, or the viewport around the mower if render_viewport
+        is set.
         """
         assert self._reset == True, "Did you reset the environment?"
+        grid = self._get_viewport_grid()
+        width, height = grid.shape
 
         # Renders the grid to the console.
         if mode == "console":
             grid_string = ""
-            for y in range(self.height):
-                for x in range(self.width):
-                    assert self.grid[x, y] in GRID_INDICES, str(self.grid[x, y])
-                    grid_character = grid_to_character[self.grid[x, y]]
+            for y in range(height):
+                for x in range(width):
+                    assert grid[x, y] in GRID_INDICES, str(grid[x, y])
+                    grid_character = grid_to_character[grid[x, y]]
 
                     grid_string += grid_character + " "
                 grid_string += "\n"
@@ -303,37 +813,174 @@ class LawnmowerEnv(gym.Env):
         # Renders the grid to a pygame window.
         elif mode == "window":
             # Lazy loading pygame.
+            import pygame
             if self._pygame_screen == None:
                 pygame.init()
-                pygame.display.set_caption(self.unwrapped.spec.id)
-                self.screen_width = self.width * TILE_SIZE
-                self.screen_height = self.height * TILE_SIZE
+                pygame.display.set_caption(self.unwrapped.spec.id if self.unwrapped.spec is not None else "Lawnmower")
+                self.screen_width = width * self.tile_size
+                self.screen_height = height * self.tile_size
                 self._pygame_screen = pygame.display.set_mode((self.screen_width, self.screen_height))
 
             # Consume events.
             for event in pygame.event.get():
                 pass
 
-            # Render grid.
-            for x, column in enumerate(self.grid):
-                for y, cell in enumerate(column):
-                    screen_x = x * TILE_SIZE
-                    screen_y = y * TILE_SIZE
-                    self._pygame_screen.blit(grid_to_image[cell], (screen_x, screen_y))
+            # Render grid. One blit of the whole frame instead of one per cell.
+            frame = render_rgb_array(grid, self.tile_size)
+            pygame.surfarray.blit_array(self._pygame_screen, frame.transpose(1, 0, 2))
 
             # Flip
             pygame.display.flip()
 
-    def _random_position(self):
+        # Renders the grid to an RGB array with the shape (height * tile_size, width * tile_size, 3).
+        elif mode == "rgb_array":
+            return render_rgb_array(grid, self.tile_size)
+
+        # You are not supposed to be here.
+        else:
+            assert False, str(mode)
+
+    def _get_viewport_grid(self):
+        """
+        Yields the part of the grid that is rendered. That is the viewport
+        around the mower, shifted to stay inside the grid, or the whole grid.
+        """
+        if self.render_viewport is None:
+            return self.grid
+        viewport_width = min(self.render_viewport[0], self.width)
+        viewport_height = min(self.render_viewport[1], self.height)
+        x, y = self.mower_position
+        left = min(max(x - viewport_width // 2, 0), self.width - viewport_width)
+        top = min(max(y - viewport_height // 2, 0), self.height - viewport_height)
+        return self.grid[left:left + viewport_width, top:top + viewport_height]
+
+    def _count_grass(self):
+        """
+        Counts the unmowed grass on the whole grid, minus the grass that the
+        mower cannot reach.
+        """
+        return self.width * self.height - np.count_nonzero(self.grid) - self.unreachable_grass_count
+
+    def _check_grass_count(self):
+        """
+        Makes sure that the incremental grass counter agrees with the grid.
+        """
+        grass_count = self._count_grass()
+        assert self.grass_count == grass_count, "Grass counter is {}, grid has {}.".format(self.grass_count, grass_count)
+
+    def _schedule_regrowth(self, x, y):
+        """
+        Lets a freshly mowed cell regrow after the regrowth delay.
+        """
+        minimum, maximum = self.regrowth_delay
+        delay = minimum if minimum == maximum else int(self.np_random.integers(minimum, maximum + 1))
+        due_step = self.current_step + delay
+        self._regrowth_due[x, y] = due_step
+        self._regrowth_wheel[due_step % len(self._regrowth_wheel)].append((x, y, due_step))
+
+    def _regrow(self):
+        """
+        Lets the cells regrow that are due in the current step. Cells that have
+        been mowed again since are skipped, they have a later event. So are
+        cells the mower stands on, they are rescheduled when it leaves.
+        """
+        bucket = self._regrowth_wheel[self.current_step % len(self._regrowth_wheel)]
+        for x, y, due_step in bucket:
+            if self._regrowth_due[x, y] != due_step:
+                continue
+            self._regrowth_due[x, y] = -1
+            if self.grid[x, y] == GRID_INDEX_MOWED:
+                self.grid[x, y] = GRID_INDEX_GRASS
+                self.grass_count += 1
+                if self.planes is not None:
+                    self._update_planes((x, y))
+        bucket.clear()
+
+    def _clear_regrowth(self):
         """
-        Yields a random position on the grid that is not a border.
+        Forgets all pending regrowths.
         """
-        x = random.randint(1, self.width - 2)
-        y = random.randint(1, self.height- 2)
-        return x, y
+        for bucket in self._regrowth_wheel:
+            bucket.clear()
+        self._regrowth_due[...] = -1
+
+    def _get_regrowth_events(self):
+        """
+        Yields the pending regrowths as a tuple of (x, y, due step).
+        """
+        if self._regrowth_wheel is None:
+            return None
+        return tuple(event for bucket in self._regrowth_wheel for event in bucket if self._regrowth_due[event[0], event[1]] == event[2])
+
+    def _create_windows(self):
+        """
+        Places the grid inside a grid that is padded with obstacles and creates
+        a strided view with the window around every cell of the grid.
+        """
+        radius = self.window_size // 2
+        self._padded_grid = np.full((self.width + 2 * radius, self.height + 2 * radius), GRID_INDEX_OBSTACLE, dtype=np.uint8)
+        self.grid = self._padded_grid[radius:radius + self.width, radius:radius + self.height]
+
+        # Like sliding_window_view, which needs NumPy 1.20. Window x, y starts at padded cell x, y.
+        self._windows = np.lib.stride_tricks.as_strided(
+            self._padded_grid,
+            shape=(self.width, self.height, self.window_size, self.window_size),
+            strides=self._padded_grid.strides * 2,
+            writeable=False
+        )
+
+    def _get_window(self):
+        """
+        Yields the read-only window around the mower. It is a view of the grid.
+        """
+        x, y = self.mower_position
+        window = self._windows[x, y]
+        if self.window_rotation:
+            window = np.rot90(window, orientation_to_window_rotations[self.mower_orientation])
+        return window
+
+    def _build_planes(self):
+        """
+        Builds all feature planes from the grid.
+        """
+        if self.planes is not None:
+            self.planes[...] = np.moveaxis(GRID_TO_PLANES[self.grid], -1, 0)
+
+    def _update_planes(self, position):
+        """
+        Updates the feature planes of a single cell from the grid.
+        """
+        x, y = position
+        self.planes[:, x, y] = GRID_TO_PLANES[self.grid[x, y]]
 
     def _get_observation(self):
         """
-        Yields the grid as an observation.
+        Yields the grid, the feature planes or the window as an observation.
+        See the observation modes and types.
         """
-        return self.grid.copy()
+        if self.observation_type == OBSERVATION_TYPE_WINDOW:
+            source = self._get_window()
+        elif self.observation_type == OBSERVATION_TYPE_PLANES:
+            source = self.planes
+        else:
+            source = self.grid
+
+        if self.observation_mode == OBSERVATION_MODE_COPY:
+            return source.copy()
+
+        # A read-only view. Windows are read-only views already.
+        elif self.observation_mode == OBSERVATION_MODE_VIEW:
+            if self.observation_type == OBSERVATION_TYPE_WINDOW:
+                return source
+            if self._observation_source is not source:
+                self._observation_view = source.view()
+                self._observation_view.flags.writeable = False
+                self._observation_source = source
+            return self._observation_view
+
+        # The next frame of the ring buffer.
+        elif self.observation_mode == OBSERVATION_MODE_BUFFER:
+            observation = self._observation_frames[self._observation_buffer_index]
+            observation[...] = source
+            self._observation_buffer_index = (self._observation_buffer_index + 1) % len(self._observation_frames)
+            return observation
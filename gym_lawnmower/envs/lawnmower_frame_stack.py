@@ -0,0 +1,88 @@
+import numpy as np
+from gym import spaces
+
+
+class LawnmowerFrameStack(object):
+    """
+    Stacks the last frame_number observations of a LawnmowerEnv, a
+    LawnmowerVectorEnv or a LawnmowerSubprocVectorEnv. Observations have the
+    shape (frame_number,) + frame shape for a single environment and
+    (number, frame_number) + frame shape for vector environments. The frame
+    shape is (width, height) for grids. The oldest frame comes first.
+
+    The frames live in a preallocated ring buffer that holds every frame twice,
+    so the last frame_number frames are always one contiguous slice of it.
+    Observations are read-only views of that buffer. The wrapper owns them and
+    they change with the next step or reset. Copy them if you need to keep
+    them. Use the observation mode "view" of the wrapped environment to avoid
+    all allocations per step.
+
+    After a reset, and for vector environments after an automatic reset of a
+    lawn, all frames are filled with the first observation.
+    """
+
+    def __init__(self, env, frame_number=4):
+        self.env = env
+        self.frame_number = frame_number
+
+        # Vector environments have a number of lawns.
+        self.is_vector = hasattr(env, "number")
+        number = env.number if self.is_vector else 1
+        frame_space = env.single_observation_space if self.is_vector else env.observation_space
+
+        # Every frame is stored twice.
+        self._buffer = np.zeros((number, 2 * frame_number) + frame_space.shape, dtype=np.uint8)
+        self._index = 0
+
+        # Precomputed read-only views for every position of the ring.
+        self._views = []
+        for index in range(frame_number):
+            view = self._buffer[:, index + 1:index + 1 + frame_number]
+            if not self.is_vector:
+                view = view[0]
+            view.flags.writeable = False
+            self._views.append(view)
+
+        # Observation space.
+        self.observation_space = spaces.Box(low=0, high=int(frame_space.high.max()), shape=self._views[0].shape, dtype=np.uint8)
+
+        # Action space.
+        self.action_space = env.action_space
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def reset(self, **kwargs):
+        """
+        Resets the environment and fills all frames with the first observation.
+        """
+        observation = self.env.reset(**kwargs)
+        self._buffer[...] = self._as_batch(observation)[:, np.newaxis]
+        self._index = self.frame_number - 1
+        return self._views[self._index]
+
+    def step(self, action):
+        """
+        Performs one step and appends the observation to the stack.
+        """
+        observation, reward, done, info = self.env.step(action)
+        observation = self._as_batch(observation)
+
+        # Write the frame twice.
+        self._index = (self._index + 1) % self.frame_number
+        self._buffer[:, self._index] = observation
+        self._buffer[:, self._index + self.frame_number] = observation
+
+        # Lawns that have been reset automatically start with a fresh stack.
+        if self.is_vector and np.any(done):
+            self._buffer[done] = observation[done][:, np.newaxis]
+
+        return self._views[self._index], reward, done, info
+
+    def _as_batch(self, observation):
+        """
+        Adds the lawn axis to observations of a single environment.
+        """
+        if self.is_vector:
+            return observation
+        return observation[np.newaxis]
@@ -0,0 +1,89 @@
+"""
+Pre-generated lawn layouts. A layout file is a .npy file with one record per
+layout. Every record holds the grid with the mower and the obstacles, the
+position and orientation of the mower, the amount of reachable grass to mow
+and the amount of grass that is walled off by obstacles. The file can be
+memory-mapped, so resetting to a stored layout is a single copy and many
+processes share the same page-cached file.
+
+Generate layouts for a registered environment like this:
+
+    python -m gym_lawnmower.envs.lawnmower_layouts lawnmower-medium-obstacles-v0 1000000 layouts.npy --seed 0
+"""
+import argparse
+import numpy as np
+
+
+# Number of layouts generated at once.
+CHUNK_SIZE = 4096
+
+
+def layout_dtype(width, height):
+    """
+    Yields the record type of a layout for the given grid size.
+    """
+    return np.dtype([
+        ("grid", np.uint8, (width, height)),
+        ("mower_x", np.uint16),
+        ("mower_y", np.uint16),
+        ("mower_orientation", np.uint8),
+        ("grass_count", np.uint32),
+        ("unreachable_grass_count", np.uint32),
+    ])
+
+
+def generate_layouts(filename, count, width, height, obstacle_number, seed=None, check_reachability=True, **kwargs):
+    """
+    Generates count layouts and writes them to filename. Takes the kwargs of a
+    registered environment. Kwargs that do not affect the layout, for example
+    max_steps, are ignored.
+    """
+    from gym_lawnmower.envs.lawnmower_vector_env import LawnmowerVectorEnv
+
+    layouts = np.lib.format.open_memmap(filename, mode="w+", dtype=layout_dtype(width, height), shape=(count,))
+
+    # Use the vectorized reset of the vector environment.
+    environment = LawnmowerVectorEnv(min(CHUNK_SIZE, count), width, height, obstacle_number, max_steps=1, check_reachability=check_reachability)
+    environment.seed(seed)
+    for start in range(0, count, environment.number):
+        stop = min(start + environment.number, count)
+        environment.reset()
+        layouts["grid"][start:stop] = environment.grids[:stop - start]
+        layouts["mower_x"][start:stop] = environment.mower_x[:stop - start]
+        layouts["mower_y"][start:stop] = environment.mower_y[:stop - start]
+        layouts["mower_orientation"][start:stop] = environment.mower_orientation[:stop - start]
+        layouts["grass_count"][start:stop] = environment.grass_count[:stop - start]
+        layouts["unreachable_grass_count"][start:stop] = environment.unreachable_grass_count[:stop - start]
+
+    layouts.flush()
+    return layouts
+
+
+def load_layouts(filename, width=None, height=None):
+    """
+    Memory-maps a layout file. Checks the grid size if it is given.
+    """
+    layouts = np.load(filename, mmap_mode="r")
+    assert layouts.dtype.names is not None and "grid" in layouts.dtype.names, "{} is not a layout file.".format(filename)
+    if width is not None and height is not None:
+        assert layouts.dtype["grid"].shape == (width, height), "Layouts in {} have the grid size {}, expected {}.".format(filename, layouts.dtype["grid"].shape, (width, height))
+    return layouts
+
+
+def main():
+    import gym_lawnmower
+    from gym_lawnmower.envs.lawnmower_env import get_lawn_kwargs
+
+    parser = argparse.ArgumentParser(description="Generates lawn layouts for a registered environment.")
+    parser.add_argument("environment_id", help="For example lawnmower-medium-obstacles-v0.")
+    parser.add_argument("count", type=int, help="Number of layouts.")
+    parser.add_argument("filename", help="The .npy file to write.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible layouts.")
+    arguments = parser.parse_args()
+
+    generate_layouts(arguments.filename, arguments.count, seed=arguments.seed, **get_lawn_kwargs(arguments.environment_id))
+    print("Wrote {} layouts for {} to {}.".format(arguments.count, arguments.environment_id, arguments.filename))
+
+
+if __name__ == "__main__":
+    main()
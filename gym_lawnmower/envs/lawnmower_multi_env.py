@@ -0,0 +1,233 @@
+import gym
+import numpy as np
+from gym import spaces
+from gym_lawnmower.envs.lawnmower_env import LawnmowerSeedingMixin, get_lawn_kwargs, split_grass, render_rgb_array, grid_to_character, TILE_SIZE, GRID_INDEX_GRASS, GRID_INDEX_MOWED, GRID_INDEX_OBSTACLE, GRID_INDEX_MOWER_UP, GRID_INDEX_MAX, ACTION_INDEX_FORWARD, ACTION_INDEX_LEFT, ACTION_INDEX_RIGHT, ACTION_INDEX_MAX, ORIENTATION_INDEX_MAX, REWARD_MOWED, REWARD_NOT_MOWED, REWARD_NOT_MOWED_SAME_CELL, REWARD_TOO_MANY_TURNS, REWARD_OBSTACLE_COLLISION, REWARD_EXCEEDED, REWARD_ALL_MOWED
+from gym_lawnmower.envs.lawnmower_vector_env import ORIENTATION_TO_GRID, ORIENTATION_TO_DELTA_X, ORIENTATION_TO_DELTA_Y
+
+
+# Reward for driving into another mower.
+REWARD_MOWER_COLLISION = REWARD_OBSTACLE_COLLISION
+
+
+class LawnmowerMultiEnv(LawnmowerSeedingMixin, gym.Env):
+    """
+    A fleet of mowers on one shared lawn. Every step takes one action per
+    mower and moves all mowers at once with NumPy operations. The rules and
+    rewards per mower are the ones of the LawnmowerEnv. On top of that a
+    mower collides with another mower if it drives into a cell that held a
+    mower at the beginning of the step, or if several mowers drive into the
+    same cell. Any collision ends the episode. So does a completely mowed
+    lawn, in which case the mowers that mowed the last patches get
+    REWARD_ALL_MOWED. Rewards are returned as an array with one reward per
+    mower.
+    """
+
+    metadata = {"render.modes": ["console", "rgb_array"]}
+
+    def __init__(self, width, height, obstacle_number, max_steps, mower_number=2, check_reachability=True, tile_size=TILE_SIZE):
+
+        # Parameters.
+        self.width = width
+        self.height = height
+        self.obstacle_number = obstacle_number
+        self.max_steps = max_steps
+        self.mower_number = mower_number
+        self.check_reachability = check_reachability
+        self.tile_size = tile_size
+
+        # The mowers and the obstacles have to fit inside the border.
+        self._inner_size = (self.width - 2) * (self.height - 2)
+        assert self.obstacle_number + self.mower_number <= self._inner_size, "{} obstacles and {} mowers do not fit into {} inner cells.".format(self.obstacle_number, self.mower_number, self._inner_size)
+
+        # Observation space.
+        self.observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.width, self.height), dtype=np.uint8)
+
+        # Action space. One action per mower.
+        self.action_space = spaces.MultiDiscrete([ACTION_INDEX_MAX + 1] * self.mower_number)
+
+        # The state of the lawn and the mowers.
+        self.grid = np.zeros((self.width, self.height), dtype=np.uint8)
+        self.mower_x = np.zeros(self.mower_number, dtype="int64")
+        self.mower_y = np.zeros(self.mower_number, dtype="int64")
+        self.mower_orientation = np.zeros(self.mower_number, dtype="int64")
+        self.turn_count = np.zeros(self.mower_number, dtype="int64")
+        self.current_step = 0
+        self.grass_count = 0
+        self.unreachable_grass_count = 0
+
+        # Every environment has its own stream of random numbers.
+        self.seed()
+        self._reset = False
+
+    @classmethod
+    def from_spec(cls, mower_number, environment_id, **kwargs):
+        """
+        Creates a fleet on the lawn of a registered environment.
+        """
+        return cls(mower_number=mower_number, **get_lawn_kwargs(environment_id), **kwargs)
+
+    def step(self, actions):
+        """
+        Performs one step of the simulation with one action per mower.
+        """
+        # The environment should be reset at the beginning.
+        assert self._reset == True, "Did you reset the environment?"
+
+        actions = np.asarray(actions)
+        assert actions.shape == (self.mower_number,), str(actions.shape)
+        assert np.all((actions >= 0) & (actions <= ACTION_INDEX_MAX)), str(actions)
+
+        rewards = np.zeros(self.mower_number, dtype="float64")
+        info = {}
+
+        # Count the steps.
+        self.current_step += 1
+
+        # Terminate the simulation if the number of steps has been exceeded.
+        if self.current_step == self.max_steps:
+            rewards[:] = REWARD_EXCEEDED
+            info["done_reason"] = "Steps exceeded."
+            return self._get_observation(), rewards, True, info
+
+        # Turn left or right. If there are too many turns, yield a negative reward.
+        left = actions == ACTION_INDEX_LEFT
+        right = actions == ACTION_INDEX_RIGHT
+        turning = left | right
+        self.mower_orientation = (self.mower_orientation - left + right) % 4
+        self.turn_count += turning
+        rewards[turning] = np.where(self.turn_count[turning] > 3, REWARD_TOO_MANY_TURNS, REWARD_NOT_MOWED_SAME_CELL)
+
+        # Compute the potential new positions.
+        forward = actions == ACTION_INDEX_FORWARD
+        new_x = self.mower_x + forward * ORIENTATION_TO_DELTA_X[self.mower_orientation]
+        new_y = self.mower_y + forward * ORIENTATION_TO_DELTA_Y[self.mower_orientation]
+        target = self.grid[new_x, new_y]
+
+        # Collisions with obstacles and with mowers that were there before.
+        obstacle_collided = forward & (target == GRID_INDEX_OBSTACLE)
+        mower_collided = forward & (target >= GRID_INDEX_MOWER_UP)
+
+        # Collisions of mowers that drive into the same cell.
+        candidates = np.flatnonzero(forward & ~obstacle_collided & ~mower_collided)
+        target_cells = new_x[candidates] * self.height + new_y[candidates]
+        _, inverse, counts = np.unique(target_cells, return_inverse=True, return_counts=True)
+        mower_collided[candidates[counts[inverse] > 1]] = True
+
+        # Mow the lawn and move the robots.
+        moving = forward & ~obstacle_collided & ~mower_collided
+        new_was_grass = moving & (target == GRID_INDEX_GRASS)
+        self.grid[self.mower_x[moving], self.mower_y[moving]] = GRID_INDEX_MOWED
+        self.mower_x[moving] = new_x[moving]
+        self.mower_y[moving] = new_y[moving]
+        self.grid[self.mower_x, self.mower_y] = ORIENTATION_TO_GRID[self.mower_orientation]
+        self.grass_count -= int(np.count_nonzero(new_was_grass))
+        rewards[moving] = np.where(new_was_grass[moving], REWARD_MOWED, REWARD_NOT_MOWED)
+
+        # For counting turns. Moving is not a turn.
+        self.turn_count[moving] = 0
+
+        # Hitting obstacles or other mowers. Terminate and reward.
+        rewards[obstacle_collided] = REWARD_OBSTACLE_COLLISION
+        rewards[mower_collided] = REWARD_MOWER_COLLISION
+        done = False
+        if np.any(obstacle_collided):
+            done = True
+            info["done_reason"] = "Collision with obstacle."
+        elif np.any(mower_collided):
+            done = True
+            info["done_reason"] = "Collision with mower."
+
+        # The whole lawn has been mowed. Terminate and reward.
+        elif self.grass_count == 0 and np.any(new_was_grass):
+            rewards[new_was_grass] = REWARD_ALL_MOWED
+            done = True
+            info["done_reason"] = "All mowed"
+
+        info["obstacle_collided"] = obstacle_collided
+        info["mower_collided"] = mower_collided
+        return self._get_observation(), rewards, done, info
+
+    def reset(self, seed=None):
+        """
+        Resets the entire environment. Should be called in the beginning and
+        everytime a simulation is over. Reseeds the environment if a seed is
+        given.
+        """
+        if seed is not None:
+            self.seed(seed)
+
+        self._reset = True
+
+        # Count the current step and the turns.
+        self.current_step = 0
+        self.turn_count[:] = 0
+
+        # Generate layouts until the mowers are not walled in.
+        while True:
+            self._place_layout()
+            if not self.check_reachability or self.obstacle_number == 0:
+                break
+
+            # Only the grass that any mower can reach has to be mowed.
+            reachable_grass_count, unreachable_grass_count, walled_in = split_grass(self.grid[np.newaxis], self.mower_x, self.mower_y, self.grass_count)
+            self.grass_count = int(reachable_grass_count[0])
+            self.unreachable_grass_count = int(unreachable_grass_count[0])
+            if not walled_in[0]:
+                break
+
+        return self._get_observation()
+
+    def _place_layout(self):
+        """
+        Places the mowers and the obstacles randomly.
+        """
+        # Create an empty grid with a border.
+        self.grid[1:-1, 1:-1] = GRID_INDEX_GRASS
+        self.grid[[0, -1], :] = GRID_INDEX_OBSTACLE
+        self.grid[:, [0, -1]] = GRID_INDEX_OBSTACLE
+
+        # Pick distinct inner cells for the mowers and the obstacles at once.
+        cells = self.np_random.choice(self._inner_size, self.mower_number + self.obstacle_number, replace=False)
+        cells_x, cells_y = np.divmod(cells, self.height - 2)
+        cells_x += 1
+        cells_y += 1
+
+        # Add obstacles and mowers.
+        self.grid[cells_x[self.mower_number:], cells_y[self.mower_number:]] = GRID_INDEX_OBSTACLE
+        self.mower_x[:] = cells_x[:self.mower_number]
+        self.mower_y[:] = cells_y[:self.mower_number]
+        self.mower_orientation[:] = self.np_random.integers(0, ORIENTATION_INDEX_MAX + 1, size=self.mower_number)
+        self.grid[self.mower_x, self.mower_y] = ORIENTATION_TO_GRID[self.mower_orientation]
+
+        # Count the unmowed grass once. Steps keep the counter up to date.
+        self.grass_count = self._inner_size - self.mower_number - self.obstacle_number
+        self.unreachable_grass_count = 0
+
+    def render(self, mode="console", close=False):
+        """
+        Renders the grid.
+        """
+        assert self._reset == True, "Did you reset the environment?"
+
+        # Renders the grid to the console.
+        if mode == "console":
+            grid_string = ""
+            for y in range(self.height):
+                for x in range(self.width):
+                    grid_string += grid_to_character[self.grid[x, y]] + " "
+                grid_string += "\n"
+            print(grid_string)
+
+        # Renders the grid to an RGB array with the shape (height * tile_size, width * tile_size, 3).
+        elif mode == "rgb_array":
+            return render_rgb_array(self.grid, self.tile_size)
+
+        # You are not supposed to be here.
+        else:
+            assert False, str(mode)
+
+    def _get_observation(self):
+        """
+        Yields the grid as an observation.
+        """
+        return self.grid.copy()
@@ -0,0 +1,127 @@
+import collections
+import functools
+import time
+
+
+class LawnmowerProfiler(object):
+    """
+    Counts calls and cumulative time of the phases of an environment, and the
+    finished episodes by done_reason. Attaching replaces the methods of the
+    phases on the instance with timed wrappers. Environments without a
+    profiler keep their original methods and pay nothing.
+    """
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.seconds = collections.Counter()
+        self.done_reasons = collections.Counter()
+
+    def attach(self, environment, phases, step_name="step"):
+        """
+        Times the given methods of the environment. The method step_name is
+        timed too and its infos are used to count the done reasons.
+        """
+        for phase in phases:
+            setattr(environment, phase, self._wrap(phase, getattr(environment, phase)))
+        setattr(environment, step_name, self._wrap_step(step_name, getattr(environment, step_name)))
+
+    def detach(self, environment, phases, step_name="step"):
+        """
+        Restores the original methods of the environment.
+        """
+        for phase in list(phases) + [step_name]:
+            environment.__dict__.pop(phase, None)
+
+    def clear(self):
+        """
+        Forgets all counts and times.
+        """
+        self.calls.clear()
+        self.seconds.clear()
+        self.done_reasons.clear()
+
+    def snapshot(self):
+        """
+        Yields a dictionary with the current counts and times. It is a copy
+        and does not change afterwards.
+        """
+        phases = {}
+        for phase in self.calls:
+            phases[phase] = {
+                "calls": self.calls[phase],
+                "seconds": self.seconds[phase],
+                "seconds_per_call": self.seconds[phase] / self.calls[phase],
+            }
+        return {
+            "phases": phases,
+            "episodes": sum(self.done_reasons.values()),
+            "done_reasons": dict(self.done_reasons),
+        }
+
+    def _wrap(self, phase, method):
+        calls = self.calls
+        seconds = self.seconds
+        perf_counter = time.perf_counter
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            result = method(*args, **kwargs)
+            seconds[phase] += perf_counter() - start
+            calls[phase] += 1
+            return result
+        return wrapper
+
+    def _wrap_step(self, phase, method):
+        timed_method = self._wrap(phase, method)
+        done_reasons = self.done_reasons
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            result = timed_method(*args, **kwargs)
+            infos = result[3]
+
+            # Vector environments yield one info per lawn.
+            if isinstance(infos, dict):
+                infos = [infos]
+            for info in infos:
+                if "done_reason" in info:
+                    done_reasons[info["done_reason"]] += 1
+            return result
+        return wrapper
+
+
+class LawnmowerProfilingMixin(object):
+    """
+    Adds optional profiling to an environment. Subclasses list the methods
+    that are timed in PROFILED_PHASES. Steps are always timed. Environments
+    set self.profiler to None in their constructor.
+    """
+
+    PROFILED_PHASES = []
+
+    def enable_profiling(self):
+        """
+        Starts counting calls and time of step and of the PROFILED_PHASES,
+        and the finished episodes by done_reason. See get_stats.
+        """
+        if self.profiler is None:
+            self.profiler = LawnmowerProfiler()
+            self.profiler.attach(self, self.PROFILED_PHASES)
+
+    def disable_profiling(self):
+        """
+        Stops profiling and restores the uninstrumented methods.
+        """
+        if self.profiler is not None:
+            self.profiler.detach(self, self.PROFILED_PHASES)
+            self.profiler = None
+
+    def get_stats(self):
+        """
+        Yields a snapshot of the profiling counters and timers, None if
+        profiling is disabled.
+        """
+        if self.profiler is None:
+            return None
+        return self.profiler.snapshot()
@@ -0,0 +1,450 @@
+"""
+Records trajectories of a LawnmowerEnv to disk and reads them back for
+offline reinforcement learning.
+
+    recorder = LawnmowerRecorder(LawnmowerEnv(...), "trajectories")
+    ...
+    recorder.close()
+
+    dataset = LawnmowerDataset("trajectories")
+    batch = dataset.sample(32)
+"""
+import collections
+import json
+import os
+import struct
+import zipfile
+import numpy as np
+from gym_lawnmower.envs.lawnmower_env import ACTION_INDEX_MAX
+
+
+# Codes for the done reasons. Code 0 means not done.
+DONE_REASONS = ["", "Steps exceeded.", "Collision with obstacle.", "All mowed"]
+DONE_REASON_CODES = {done_reason: code for code, done_reason in enumerate(DONE_REASONS)}
+
+# Name of the file that lists the chunks.
+INDEX_FILENAME = "index.json"
+
+# Size of the fixed part of a local file header in a zip archive.
+ZIP_LOCAL_HEADER_SIZE = 30
+
+# Member of a chunk file that holds the raw keyframes, one grid after another.
+KEYFRAMES_MEMBER = "keyframes.bin"
+
+# Bytes that a basic action adds to the deltas. Two cells of int32 and uint8.
+DELTA_BYTES_PER_STEP = 10
+
+# Smallest default distance between keyframes.
+KEYFRAME_INTERVAL_MIN = 64
+
+# Keyframes are collected up to this many bytes before they are written to the chunk file.
+KEYFRAME_BUFFER_SIZE = 1 << 20
+
+# Chunks are compressed while recording, so speed matters more than size.
+COMPRESS_LEVEL = 1
+
+
+class LawnmowerRecorder(object):
+    """
+    Records the transitions of a LawnmowerEnv into chunk files in a
+    directory. A transition is the grid before the step, the action, the
+    reward, done and the done_reason. The grid is recorded for every
+    observation type.
+
+    Grids are not stored per step. Every step stores only the cells that it
+    changed, which are one or two for basic actions. Full grids, the
+    keyframes, are stored at the beginning of every chunk and episode and
+    every keyframe_interval steps, which bounds the work to restore a grid.
+    By default the interval grows with the grid, so that the keyframes take
+    about as many bytes as the deltas between them. Keyframes are written to
+    the chunk file in blocks. Only the columns of the current chunk of
+    chunk_size transitions and at most KEYFRAME_BUFFER_SIZE bytes of
+    keyframes are kept in memory.
+
+    Chunks are compressed .npz files. With compress=False they are written
+    uncompressed and the LawnmowerDataset memory-maps them.
+    """
+
+    def __init__(self, env, directory, chunk_size=65536, keyframe_interval=None, compress=True):
+        self.env = env
+        self.directory = directory
+
+        # Deltas are taken from the grid of the unwrapped environment.
+        self._lawn = env.unwrapped
+        self.width = self._lawn.width
+        self.height = self._lawn.height
+
+        if keyframe_interval is None:
+            keyframe_interval = max(KEYFRAME_INTERVAL_MIN, self.width * self.height // DELTA_BYTES_PER_STEP)
+        assert chunk_size >= 1, str(chunk_size)
+        assert keyframe_interval >= 1, str(keyframe_interval)
+        self.chunk_size = chunk_size
+        self.keyframe_interval = keyframe_interval
+        self.compress = compress
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Basic actions only change the cells of the mower, unless they are repeated or grass regrows.
+        self._basic_steps = self._lawn.action_repeat == 1 and self._lawn._regrowth_wheel is None
+
+        # The file of the current chunk. Keyframes are written to it in blocks.
+        self._archive = None
+        self._keyframe_file = None
+        self._keyframe_buffer = bytearray()
+        self._steps_since_keyframe = 0
+
+        # The columns of the current chunk. Lists of Python scalars are the cheapest to append to.
+        self._start_chunk()
+        self._chunks = []
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def __del__(self):
+        if getattr(self, "_archive", None) is not None:
+            self._discard_chunk()
+
+    def reset(self, **kwargs):
+        """
+        Resets the environment and stores a keyframe.
+        """
+        observation = self.env.reset(**kwargs)
+        self._add_keyframe()
+        return observation
+
+    def step(self, action):
+        """
+        Performs one step and records the transition.
+        """
+        lawn = self._lawn
+        old_position = lawn.mower_position
+
+        # Macro actions, repeats and regrowth can change any cell. Then the whole grids are compared.
+        basic_step = action <= ACTION_INDEX_MAX and self._basic_steps
+        previous_grid = None if basic_step else lawn.grid.copy()
+
+        observation, reward, done, info = self.env.step(action)
+
+        self._actions.append(action)
+        self._rewards.append(reward)
+        self._dones.append(done)
+        self._done_reasons.append(DONE_REASON_CODES[info.get("done_reason", "")])
+
+        # Store the changed cells. A basic action changes the old and the new cell of the mower.
+        grid = lawn.grid
+        if basic_step:
+            x, y = old_position
+            self._delta_cells.append(x * self.height + y)
+            self._delta_values.append(grid.item(x, y))
+            new_position = lawn.mower_position
+            if new_position != old_position:
+                x, y = new_position
+                self._delta_cells.append(x * self.height + y)
+                self._delta_values.append(grid.item(x, y))
+        else:
+            cells = np.flatnonzero(grid != previous_grid)
+            self._delta_cells.extend(cells.tolist())
+            self._delta_values.extend(grid.flat[cells].tolist())
+        self._delta_offsets.append(len(self._delta_cells))
+        self._steps_since_keyframe += 1
+
+        # A new chunk or a long episode needs a keyframe.
+        if len(self._actions) == self.chunk_size:
+            self._flush()
+            self._add_keyframe()
+        elif self._steps_since_keyframe == self.keyframe_interval:
+            self._add_keyframe()
+
+        return observation, reward, done, info
+
+    def close(self):
+        """
+        Writes the last chunk and closes the environment.
+        """
+        if len(self._actions) > 0:
+            self._flush()
+
+        # A chunk with keyframes but without transitions is dropped.
+        elif self._archive is not None:
+            self._discard_chunk()
+        self.env.close()
+
+    def _start_chunk(self):
+        """
+        Empties the columns of the current chunk.
+        """
+        self._actions = []
+        self._rewards = []
+        self._dones = []
+        self._done_reasons = []
+
+        # The changed cells of transition i are delta_offsets[i] to delta_offsets[i + 1].
+        self._delta_offsets = [0]
+        self._delta_cells = []
+        self._delta_values = []
+
+        # The transitions that start from the keyframes.
+        self._keyframe_transitions = []
+
+    def _add_keyframe(self):
+        """
+        Stores the current grid as the start of the next transition. Opens
+        the chunk file with the first keyframe of a chunk.
+        """
+        if self._archive is None:
+            filename = os.path.join(self.directory, "chunk_{:06d}.npz".format(len(self._chunks)))
+            compression = zipfile.ZIP_DEFLATED if self.compress else zipfile.ZIP_STORED
+            self._archive = zipfile.ZipFile(filename, "w", compression=compression, compresslevel=COMPRESS_LEVEL)
+            self._keyframe_file = self._archive.open(KEYFRAMES_MEMBER, "w", force_zip64=True)
+        self._keyframe_buffer += np.ascontiguousarray(self._lawn.grid, dtype=np.uint8).data
+        if len(self._keyframe_buffer) >= KEYFRAME_BUFFER_SIZE:
+            self._write_keyframes()
+        self._keyframe_transitions.append(len(self._actions))
+        self._steps_since_keyframe = 0
+
+    def _flush(self):
+        """
+        Writes the current chunk and starts a new one. The chunk file is an
+        .npz file with one extra member for the keyframes.
+        """
+        count = len(self._actions)
+        arrays = {
+            "actions": np.array(self._actions, dtype=np.uint8),
+            "rewards": np.array(self._rewards, dtype=np.float32),
+            "dones": np.array(self._dones, dtype=bool),
+            "done_reasons": np.array(self._done_reasons, dtype=np.uint8),
+            "delta_offsets": np.array(self._delta_offsets, dtype=np.int64),
+            "delta_cells": np.array(self._delta_cells, dtype=np.int32),
+            "delta_values": np.array(self._delta_values, dtype=np.uint8),
+            "keyframe_transitions": np.array(self._keyframe_transitions, dtype=np.int64),
+        }
+
+        # Only one member can be written at a time, so the keyframes are finished first.
+        self._write_keyframes()
+        self._keyframe_file.close()
+        for name, array in arrays.items():
+            with self._archive.open(name + ".npy", "w", force_zip64=True) as file:
+                np.lib.format.write_array(file, array, allow_pickle=False)
+        self._archive.close()
+        self._chunks.append({"filename": os.path.basename(self._archive.filename), "count": count})
+        self._write_index()
+
+        self._archive = None
+        self._keyframe_file = None
+        self._start_chunk()
+
+    def _write_keyframes(self):
+        """
+        Writes the buffered keyframes to the chunk file.
+        """
+        self._keyframe_file.write(self._keyframe_buffer)
+        self._keyframe_buffer = bytearray()
+
+    def _discard_chunk(self):
+        """
+        Closes and deletes the file of the current chunk without writing it.
+        """
+        self._keyframe_buffer = bytearray()
+        self._keyframe_file.close()
+        self._archive.close()
+        os.remove(self._archive.filename)
+        self._archive = None
+        self._keyframe_file = None
+        self._start_chunk()
+
+    def _write_index(self):
+        """
+        Lists all chunks in the index file. Rewritten after every chunk, so
+        the recorded data can be read while recording goes on.
+        """
+        index = {
+            "width": self.width,
+            "height": self.height,
+            "done_reasons": DONE_REASONS,
+            "chunks": self._chunks,
+        }
+        with open(os.path.join(self.directory, INDEX_FILENAME), "w") as file:
+            json.dump(index, file, indent=2)
+
+
+class LawnmowerDataset(object):
+    """
+    Reads the transitions that a LawnmowerRecorder wrote to a directory.
+    Transitions are numbered across all chunks. Batches of arbitrary indices
+    restore their grids from the nearest keyframe and the deltas after it.
+
+    Uncompressed chunks are memory-mapped. Compressed chunks are decompressed
+    when they are first used. The last cached_chunks chunks stay in memory.
+    """
+
+    def __init__(self, directory, cached_chunks=8):
+        self.directory = directory
+        with open(os.path.join(self.directory, INDEX_FILENAME)) as file:
+            index = json.load(file)
+        self.width = index["width"]
+        self.height = index["height"]
+        self.done_reasons = index["done_reasons"]
+        self._filenames = [chunk["filename"] for chunk in index["chunks"]]
+
+        # Chunk i holds the transitions _chunk_starts[i] to _chunk_starts[i + 1].
+        counts = [chunk["count"] for chunk in index["chunks"]]
+        self._chunk_starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        self.cached_chunks = cached_chunks
+        self._cache = collections.OrderedDict()
+
+    def __len__(self):
+        return int(self._chunk_starts[-1])
+
+    def sample(self, batch_size, rng=None):
+        """
+        Yields a batch of uniformly sampled transitions.
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        return self.get_batch(rng.integers(0, len(self), size=batch_size))
+
+    def iterate_batches(self, batch_size, shuffle=True, seed=None):
+        """
+        Yields batches that cover every transition once.
+        """
+        indices = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(indices)
+        for start in range(0, len(indices), batch_size):
+            yield self.get_batch(indices[start:start + batch_size])
+
+    def get_batch(self, indices):
+        """
+        Yields a dictionary with the observations, actions, rewards,
+        next_observations, dones and done_reasons of the transitions. The
+        done reasons are codes into DONE_REASONS.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        assert np.all((indices >= 0) & (indices < len(self))), "Indices out of range."
+
+        batch_size = len(indices)
+        batch = {
+            "observations": np.zeros((batch_size, self.width, self.height), dtype=np.uint8),
+            "actions": np.zeros(batch_size, dtype=np.uint8),
+            "rewards": np.zeros(batch_size, dtype=np.float32),
+            "next_observations": np.zeros((batch_size, self.width, self.height), dtype=np.uint8),
+            "dones": np.zeros(batch_size, dtype=bool),
+            "done_reasons": np.zeros(batch_size, dtype=np.uint8),
+        }
+
+        # Gather chunk by chunk.
+        chunk_indices = np.searchsorted(self._chunk_starts, indices, side="right") - 1
+        for chunk_index in np.unique(chunk_indices):
+            positions = np.flatnonzero(chunk_indices == chunk_index)
+            transitions = indices[positions] - self._chunk_starts[chunk_index]
+            chunk = self._get_chunk(chunk_index)
+            for key in ["actions", "rewards", "dones", "done_reasons"]:
+                batch[key][positions] = chunk[key][transitions]
+            batch["observations"][positions], batch["next_observations"][positions] = self._restore(chunk, transitions)
+        return batch
+
+    def _restore(self, chunk, transitions):
+        """
+        Yields the grids before and after the transitions of one chunk. All
+        grids start from their keyframes and get the deltas since then in
+        one scatter.
+        """
+        keyframe_transitions = chunk["keyframe_transitions"]
+        keyframe_indices = np.searchsorted(keyframe_transitions, transitions, side="right") - 1
+        offsets = chunk["delta_offsets"]
+        cells = chunk["delta_cells"]
+        values = chunk["delta_values"]
+        area = self.width * self.height
+
+        # The deltas from the keyframes up to the transitions. A cell that changed several times gets its last value.
+        observations = chunk["keyframes"][keyframe_indices]
+        rows, deltas = concatenate_ranges(offsets[keyframe_transitions[keyframe_indices]], offsets[transitions])
+        targets = rows * area + cells[deltas]
+        _, last = np.unique(targets[::-1], return_index=True)
+        last = len(targets) - 1 - last
+        observations.reshape(-1)[targets[last]] = values[deltas[last]]
+
+        # The deltas of the transitions. Every cell changes at most once per transition.
+        next_observations = observations.copy()
+        rows, deltas = concatenate_ranges(offsets[transitions], offsets[transitions + 1])
+        next_observations.reshape(-1)[rows * area + cells[deltas]] = values[deltas]
+        return observations, next_observations
+
+    def _get_chunk(self, chunk_index):
+        """
+        Yields the arrays of a chunk. Keeps the recently used chunks.
+        """
+        if chunk_index in self._cache:
+            self._cache.move_to_end(chunk_index)
+            return self._cache[chunk_index]
+        chunk = load_chunk(os.path.join(self.directory, self._filenames[chunk_index]), self.width, self.height)
+        self._cache[chunk_index] = chunk
+        if len(self._cache) > self.cached_chunks:
+            self._cache.popitem(last=False)
+        return chunk
+
+
+def concatenate_ranges(starts, stops):
+    """
+    Yields the indices of all ranges starts[i] to stops[i] one after another,
+    and for every index the i of its range.
+    """
+    lengths = stops - starts
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    ends = np.cumsum(lengths)
+    indices = np.arange(ends[-1] if len(ends) > 0 else 0) + np.repeat(starts - ends + lengths, lengths)
+    return rows, indices
+
+
+def load_chunk(filename, width, height):
+    """
+    Loads all arrays of a chunk file. Arrays that are stored without
+    compression are memory-mapped. The keyframes have the shape
+    (keyframes, width, height).
+    """
+    with zipfile.ZipFile(filename) as archive:
+        infos = archive.infolist()
+    if any(info.compress_type != zipfile.ZIP_STORED for info in infos):
+        with np.load(filename) as data:
+            chunk = {name: data[name] for name in data.files if name != KEYFRAMES_MEMBER}
+            keyframes = np.frombuffer(data[KEYFRAMES_MEMBER], dtype=np.uint8)
+    else:
+        chunk = {info.filename[:-len(".npy")]: memmap_member(filename, info) for info in infos if info.filename != KEYFRAMES_MEMBER}
+        info = next(info for info in infos if info.filename == KEYFRAMES_MEMBER)
+        with open(filename, "rb") as file:
+            offset = seek_member(file, info)
+        keyframes = np.memmap(filename, dtype=np.uint8, mode="r", offset=offset, shape=(info.file_size,))
+    chunk["keyframes"] = keyframes.reshape(-1, width, height)
+    return chunk
+
+
+def seek_member(file, info):
+    """
+    Moves the file to the data of a zip member and yields the offset.
+    """
+    file.seek(info.header_offset)
+    header = file.read(ZIP_LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    file.seek(info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_length + extra_length)
+    return file.tell()
+
+
+def memmap_member(filename, info):
+    """
+    Memory-maps an .npy file that is stored uncompressed in an .npz file.
+    """
+    with open(filename, "rb") as file:
+        seek_member(file, info)
+
+        # Read the header of the .npy file.
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+        offset = file.tell()
+
+    # Empty arrays cannot be mapped.
+    if int(np.prod(shape)) == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran_order else "C")
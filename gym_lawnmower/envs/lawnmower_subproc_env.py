@@ -0,0 +1,216 @@
+import multiprocessing
+import numpy as np
+from gym import spaces
+from gym_lawnmower.envs.lawnmower_env import LawnmowerEnv, get_lawn_kwargs, GRID_INDEX_MAX, ACTION_INDEX_MAX, OBSERVATION_MODE_COPY, OBSERVATION_MODE_VIEW
+from gym_lawnmower.envs.lawnmower_profiler import LawnmowerProfilingMixin
+
+
+class LawnmowerSubprocVectorEnv(LawnmowerProfilingMixin):
+    """
+    Runs a batch of LawnmowerEnv instances in worker processes. Every worker
+    owns one or more environments whose grids live directly in a
+    shared-memory block with the shape (number, width, height). Per step each
+    worker receives one message with its actions and answers with one message
+    containing rewards, dones and infos. Grids are never sent through pipes.
+    Environments that are done are reset automatically. With a layout_file
+    all workers memory-map the same stored layouts.
+
+    With observation_mode "copy" every observation belongs to the caller. With
+    "view" it is a read-only view of the shared-memory block, which changes
+    with the next step or reset.
+    """
+
+    # Methods that are timed when profiling. Steps are always timed.
+    PROFILED_PHASES = ["_get_observation", "reset"]
+
+    def __init__(self, number, width, height, obstacle_number, max_steps, workers=None, context=None, observation_mode=OBSERVATION_MODE_COPY, layout_file=None, profiling=False):
+
+        # Parameters.
+        self.number = number
+        self.width = width
+        self.height = height
+        self.obstacle_number = obstacle_number
+        self.max_steps = max_steps
+        assert observation_mode in [OBSERVATION_MODE_COPY, OBSERVATION_MODE_VIEW], str(observation_mode)
+        self.observation_mode = observation_mode
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        self.workers = max(1, min(workers, number))
+
+        # Observation space of a single lawn and of the whole batch.
+        self.single_observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.width, self.height), dtype=np.uint8)
+        self.observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.number, self.width, self.height), dtype=np.uint8)
+
+        # Action space of a single lawn and of the whole batch.
+        self.single_action_space = spaces.Discrete(ACTION_INDEX_MAX + 1)
+        self.action_space = spaces.MultiDiscrete([ACTION_INDEX_MAX + 1] * self.number)
+
+        # Shared memory for the observations of all environments.
+        context = multiprocessing.get_context(context)
+        self._shared_observations = context.RawArray("B", self.number * self.width * self.height)
+        self._observations = np.frombuffer(self._shared_observations, dtype=np.uint8).reshape(self.number, self.width, self.height)
+        self._observation_view = self._observations.view()
+        self._observation_view.flags.writeable = False
+
+        # Distribute the environments evenly over the workers.
+        kwargs = {
+            "width": width,
+            "height": height,
+            "obstacle_number": obstacle_number,
+            "max_steps": max_steps,
+            "layout_file": layout_file,
+        }
+        self._slices = []
+        self._pipes = []
+        self._processes = []
+        bounds = np.linspace(0, self.number, self.workers + 1).astype("int64")
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent_pipe, child_pipe = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(child_pipe, parent_pipe, self._shared_observations, self.number, int(start), int(stop), kwargs),
+                daemon=True
+            )
+            process.start()
+            child_pipe.close()
+            self._slices.append(slice(int(start), int(stop)))
+            self._pipes.append(parent_pipe)
+            self._processes.append(process)
+
+        self._closed = False
+
+        # Optional instrumentation.
+        self.profiler = None
+        if profiling:
+            self.enable_profiling()
+
+    @classmethod
+    def from_spec(cls, number, environment_id, **kwargs):
+        """
+        Creates a batch of lawns like the ones of a registered environment.
+        """
+        return cls(number, **get_lawn_kwargs(environment_id), **kwargs)
+
+    def step(self, actions):
+        """
+        Performs one step of the simulation on all environments.
+        """
+        actions = np.asarray(actions)
+        assert actions.shape == (self.number,), str(actions.shape)
+
+        # One message per worker.
+        for pipe, worker_slice in zip(self._pipes, self._slices):
+            pipe.send(("step", actions[worker_slice]))
+
+        # Collect the results.
+        rewards = np.zeros(self.number, dtype="float64")
+        dones = np.zeros(self.number, dtype="bool")
+        infos = []
+        for pipe, worker_slice in zip(self._pipes, self._slices):
+            worker_rewards, worker_dones, worker_infos = pipe.recv()
+            rewards[worker_slice] = worker_rewards
+            dones[worker_slice] = worker_dones
+            infos.extend(worker_infos)
+
+        return self._get_observation(), rewards, dones, infos
+
+    def seed(self, seed=None):
+        """
+        Seeds all environments with independent streams spawned from one seed.
+        The seed can be an int, a numpy SeedSequence or None for fresh entropy.
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        seed_sequences = seed.spawn(self.number)
+        for pipe, worker_slice in zip(self._pipes, self._slices):
+            pipe.send(("seed", seed_sequences[worker_slice]))
+        for pipe in self._pipes:
+            pipe.recv()
+        return [seed.entropy]
+
+    def reset(self, seed=None):
+        """
+        Resets all environments. Should be called in the beginning. Reseeds
+        the environments if a seed is given.
+        """
+        if seed is not None:
+            self.seed(seed)
+        for pipe in self._pipes:
+            pipe.send(("reset", None))
+        for pipe in self._pipes:
+            pipe.recv()
+        return self._get_observation()
+
+    def close(self):
+        """
+        Stops all workers.
+        """
+        if self._closed:
+            return
+        for pipe in self._pipes:
+            pipe.send(("close", None))
+        for process in self._processes:
+            process.join()
+        for pipe in self._pipes:
+            pipe.close()
+        self._closed = True
+
+    def __del__(self):
+        if not getattr(self, "_closed", True):
+            self.close()
+
+    def _get_observation(self):
+        """
+        Yields the grids as an observation.
+        """
+        if self.observation_mode == OBSERVATION_MODE_VIEW:
+            return self._observation_view
+        return self._observations.copy()
+
+
+def _worker(pipe, parent_pipe, shared_observations, number, start, stop, kwargs):
+    """
+    Runs the environments start to stop in a worker process.
+    """
+    parent_pipe.close()
+    observations = np.frombuffer(shared_observations, dtype=np.uint8).reshape(number, kwargs["width"], kwargs["height"])[start:stop]
+    environments = [LawnmowerEnv(observation_mode=OBSERVATION_MODE_VIEW, grid_buffer=grid, **kwargs) for grid in observations]
+
+    while True:
+        command, data = pipe.recv()
+
+        # Step all environments and reset those that are done.
+        if command == "step":
+            rewards = []
+            dones = []
+            infos = []
+            for environment, action in zip(environments, data):
+                _, reward, done, info = environment.step(int(action))
+                if done:
+                    info["terminal_observation"] = environment.grid.copy()
+                    environment.reset()
+                rewards.append(reward)
+                dones.append(done)
+                infos.append(info)
+            pipe.send((rewards, dones, infos))
+
+        # Seed all environments.
+        elif command == "seed":
+            for environment, seed_sequence in zip(environments, data):
+                environment.seed(seed_sequence)
+            pipe.send(None)
+
+        # Reset all environments.
+        elif command == "reset":
+            for environment in environments:
+                environment.reset()
+            pipe.send(None)
+
+        # Stop the worker.
+        elif command == "close":
+            pipe.close()
+            break
+
+        # You are not supposed to be here.
+        else:
+            assert False, str(command)
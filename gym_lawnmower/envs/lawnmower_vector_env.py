@@ -0,0 +1,265 @@
+import numpy as np
+from gym import spaces
+from gym_lawnmower.envs.lawnmower_env import LawnmowerSeedingMixin, LawnmowerState, get_lawn_kwargs, split_grass, orientation_to_grid, GRID_INDEX_GRASS, GRID_INDEX_MOWED, GRID_INDEX_OBSTACLE, GRID_INDEX_MAX, ACTION_INDEX_FORWARD, ACTION_INDEX_LEFT, ACTION_INDEX_RIGHT, ACTION_INDEX_MAX, ORIENTATION_INDICES, ORIENTATION_INDEX_MAX, OBSERVATION_MODE_COPY, OBSERVATION_MODE_VIEW, REWARD_MOWED, REWARD_NOT_MOWED, REWARD_NOT_MOWED_SAME_CELL, REWARD_TOO_MANY_TURNS, REWARD_OBSTACLE_COLLISION, REWARD_EXCEEDED, REWARD_ALL_MOWED
+from gym_lawnmower.envs.lawnmower_profiler import LawnmowerProfilingMixin
+
+
+# Mapping orientations to grid as a lookup table.
+ORIENTATION_TO_GRID = np.array([orientation_to_grid[orientation] for orientation in ORIENTATION_INDICES], dtype="uint8")
+
+# Mapping orientations to the movement in x and y.
+ORIENTATION_TO_DELTA_X = np.array([0, 1, 0, -1])
+ORIENTATION_TO_DELTA_Y = np.array([-1, 0, 1, 0])
+
+
+class LawnmowerVectorEnv(LawnmowerSeedingMixin, LawnmowerProfilingMixin):
+    """
+    Simulates a batch of lawns at once. The rules and the rewards are the same
+    as in the LawnmowerEnv. All grids are stored in one array with the shape
+    (number, width, height). Every step is performed on all lawns with NumPy
+    operations. Lawns that are done are reset automatically, unless auto_reset
+    is turned off.
+    """
+
+    # Methods that are timed when profiling. Steps are always timed.
+    PROFILED_PHASES = ["_reset_lawns", "_get_observation", "reset"]
+
+    def __init__(self, number, width, height, obstacle_number, max_steps, observation_mode=OBSERVATION_MODE_COPY, check_reachability=True, auto_reset=True, profiling=False):
+
+        # Parameters.
+        self.number = number
+        self.width = width
+        self.height = height
+        self.obstacle_number = obstacle_number
+        self.max_steps = max_steps
+        assert observation_mode in [OBSERVATION_MODE_COPY, OBSERVATION_MODE_VIEW], str(observation_mode)
+        self.observation_mode = observation_mode
+        assert self.obstacle_number < (self.width - 2) * (self.height - 2), "Too many obstacles for the grid."
+        self.check_reachability = check_reachability
+        self.auto_reset = auto_reset
+
+        # Observation space of a single lawn and of the whole batch.
+        self.single_observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.width, self.height), dtype=np.uint8)
+        self.observation_space = spaces.Box(low=0, high=GRID_INDEX_MAX, shape=(self.number, self.width, self.height), dtype=np.uint8)
+
+        # Action space of a single lawn and of the whole batch.
+        self.single_action_space = spaces.Discrete(ACTION_INDEX_MAX + 1)
+        self.action_space = spaces.MultiDiscrete([ACTION_INDEX_MAX + 1] * self.number)
+
+        # The state of all lawns.
+        self.grids = np.zeros((self.number, self.width, self.height), dtype="uint8")
+        self.mower_x = np.zeros(self.number, dtype="int64")
+        self.mower_y = np.zeros(self.number, dtype="int64")
+        self.mower_orientation = np.zeros(self.number, dtype="int64")
+        self.current_step = np.zeros(self.number, dtype="int64")
+        self.turn_count = np.zeros(self.number, dtype="int64")
+        self.grass_count = np.zeros(self.number, dtype="int64")
+        self.unreachable_grass_count = np.zeros(self.number, dtype="int64")
+        self.reachable_grass_count = np.zeros(self.number, dtype="int64")
+        self._observation_view = self.grids.view()
+        self._observation_view.flags.writeable = False
+
+        # Random numbers.
+        self.seed()
+
+        # All lawns in the batch.
+        self._lawn_indices = np.arange(self.number)
+        self._reset = False
+
+        # Optional instrumentation.
+        self.profiler = None
+        if profiling:
+            self.enable_profiling()
+
+    @classmethod
+    def from_spec(cls, number, environment_id, **kwargs):
+        """
+        Creates a batch of lawns like the ones of a registered environment.
+        """
+        return cls(number, **get_lawn_kwargs(environment_id), **kwargs)
+
+    def step(self, actions):
+        """
+        Performs one step of the simulation on all lawns.
+        """
+        # The environment should be reset at the beginning.
+        assert self._reset == True, "Did you reset the environment?"
+
+        actions = np.asarray(actions)
+        assert actions.shape == (self.number,), str(actions.shape)
+        assert np.all((actions >= 0) & (actions <= ACTION_INDEX_MAX)), str(actions)
+
+        rewards = np.zeros(self.number, dtype="float64")
+
+        # Count the steps.
+        self.current_step += 1
+
+        # Terminate the simulations if the number of steps has been exceeded.
+        exceeded = self.current_step == self.max_steps
+        rewards[exceeded] = REWARD_EXCEEDED
+        active = ~exceeded
+
+        # Turn left or right. If there are too many turns, yield a negative reward.
+        left = active & (actions == ACTION_INDEX_LEFT)
+        right = active & (actions == ACTION_INDEX_RIGHT)
+        turning = left | right
+        self.mower_orientation = (self.mower_orientation - left + right) % 4
+        self.turn_count += turning
+        rewards[turning] = np.where(self.turn_count[turning] > 3, REWARD_TOO_MANY_TURNS, REWARD_NOT_MOWED_SAME_CELL)
+
+        # Compute the potential new positions.
+        forward = active & (actions == ACTION_INDEX_FORWARD)
+        new_x = self.mower_x + forward * ORIENTATION_TO_DELTA_X[self.mower_orientation]
+        new_y = self.mower_y + forward * ORIENTATION_TO_DELTA_Y[self.mower_orientation]
+        target = self.grids[self._lawn_indices, new_x, new_y]
+
+        # See if the moves are possible.
+        moving = forward & ((target == GRID_INDEX_GRASS) | (target == GRID_INDEX_MOWED))
+        collided = forward & ~moving
+        new_was_grass = moving & (target == GRID_INDEX_GRASS)
+
+        # Mow the lawns and move the robots.
+        self.grids[self._lawn_indices[moving], self.mower_x[moving], self.mower_y[moving]] = GRID_INDEX_MOWED
+        self.mower_x[moving] = new_x[moving]
+        self.mower_y[moving] = new_y[moving]
+        self.grass_count -= new_was_grass
+        all_mowed = new_was_grass & (self.grass_count == 0)
+        rewards[moving] = np.where(new_was_grass[moving], REWARD_MOWED, REWARD_NOT_MOWED)
+        rewards[all_mowed] = REWARD_ALL_MOWED
+
+        # For counting turns. Moving is not a turn.
+        self.turn_count[moving] = 0
+
+        # Hitting an obstacle.
+        rewards[collided] = REWARD_OBSTACLE_COLLISION
+
+        # Draw the mowers. This is a no-op for lawns where nothing changed.
+        self.grids[self._lawn_indices, self.mower_x, self.mower_y] = ORIENTATION_TO_GRID[self.mower_orientation]
+
+        # Collect the reasons for terminating.
+        dones = exceeded | collided | all_mowed
+        infos = [{} for _ in range(self.number)]
+        for index in np.flatnonzero(dones):
+            info = infos[index]
+            if exceeded[index]:
+                info["done_reason"] = "Steps exceeded."
+            elif collided[index]:
+                info["done_reason"] = "Collision with obstacle."
+            else:
+                info["done_reason"] = "All mowed"
+            info["terminal_observation"] = self.grids[index].copy()
+
+        # Reset the lawns that are done.
+        if self.auto_reset and np.any(dones):
+            self._reset_lawns(np.flatnonzero(dones))
+
+        return self._get_observation(), rewards, dones, infos
+
+    def reset(self, seed=None):
+        """
+        Resets all lawns. Should be called in the beginning. Reseeds the batch
+        if a seed is given.
+        """
+        if seed is not None:
+            self.seed(seed)
+        self._reset = True
+        self._reset_lawns(self._lawn_indices)
+        return self._get_observation()
+
+    def get_state(self, index):
+        """
+        Yields a snapshot of one lawn. Snapshots are interchangeable with the
+        ones of the LawnmowerEnv.
+        """
+        return LawnmowerState(
+            self.grids[index].copy(),
+            (int(self.mower_x[index]), int(self.mower_y[index])),
+            int(self.mower_orientation[index]),
+            int(self.current_step[index]),
+            int(self.turn_count[index]),
+            int(self.grass_count[index]),
+            int(self.unreachable_grass_count[index]),
+            int(self.reachable_grass_count[index])
+        )
+
+    def set_state(self, index, state):
+        """
+        Continues the simulation of one lawn from a snapshot.
+        """
+        self.grids[index] = state.grid
+        self.mower_x[index], self.mower_y[index] = state.mower_position
+        self.mower_orientation[index] = state.mower_orientation
+        self.current_step[index] = state.current_step
+        self.turn_count[index] = state.turn_count
+        self.grass_count[index] = state.grass_count
+        self.unreachable_grass_count[index] = state.unreachable_grass_count
+        self.reachable_grass_count[index] = state.reachable_grass_count
+        self._reset = True
+
+    def _reset_lawns(self, indices):
+        """
+        Resets the lawns with the given indices. Lawns where the mower is
+        walled in are generated again.
+        """
+        pending = indices
+        while len(pending) > 0:
+            self._place_lawns(pending)
+            if not self.check_reachability or self.obstacle_number == 0:
+                break
+
+            # Only the grass the mowers can reach has to be mowed.
+            reachable_grass_count, unreachable_grass_count, walled_in = split_grass(self.grids[pending], self.mower_x[pending], self.mower_y[pending], self.grass_count[pending])
+            self.grass_count[pending] = reachable_grass_count
+            self.unreachable_grass_count[pending] = unreachable_grass_count
+            pending = pending[walled_in]
+
+        self.reachable_grass_count[indices] = self.grass_count[indices]
+
+    def _place_lawns(self, indices):
+        """
+        Places the mowers and the obstacles of the given lawns randomly.
+        """
+        count = len(indices)
+
+        # Count the current steps and turns.
+        self.current_step[indices] = 0
+        self.turn_count[indices] = 0
+
+        # Create empty grids with a border.
+        grids = self.grids[indices]
+        grids[:] = GRID_INDEX_GRASS
+        grids[:, [0, -1], :] = GRID_INDEX_OBSTACLE
+        grids[:, :, [0, -1]] = GRID_INDEX_OBSTACLE
+
+        # Pick distinct inner cells for the mower and the obstacles of every lawn.
+        inner_width = self.width - 2
+        inner_height = self.height - 2
+        inner_size = inner_width * inner_height
+        cells = np.array([self.np_random.choice(inner_size, self.obstacle_number + 1, replace=False) for _ in range(count)])
+        cells_x, cells_y = np.divmod(cells, inner_height)
+        cells_x += 1
+        cells_y += 1
+
+        # Add mowers.
+        self.mower_x[indices] = cells_x[:, 0]
+        self.mower_y[indices] = cells_y[:, 0]
+        self.mower_orientation[indices] = self.np_random.integers(0, ORIENTATION_INDEX_MAX + 1, size=count)
+
+        # Add obstacles.
+        rows = np.repeat(np.arange(count), self.obstacle_number)
+        grids[rows, cells_x[:, 1:].ravel(), cells_y[:, 1:].ravel()] = GRID_INDEX_OBSTACLE
+
+        grids[np.arange(count), self.mower_x[indices], self.mower_y[indices]] = ORIENTATION_TO_GRID[self.mower_orientation[indices]]
+        self.grids[indices] = grids
+
+        # Count the unmowed grass.
+        self.grass_count[indices] = inner_size - 1 - self.obstacle_number
+        self.unreachable_grass_count[indices] = 0
+
+    def _get_observation(self):
+        """
+        Yields the grids as an observation.
+        """
+        if self.observation_mode == OBSERVATION_MODE_VIEW:
+            return self._observation_view
+        return self.grids.copy()
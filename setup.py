@@ -9,7 +9,7 @@ setup(
     long_description="This environment provided you with the opportunity to create an AI that mows the lawn with the best strategy.",
     long_description_content_type="text/markdown",
     url="https://github.com/AI-Guru/gym-lawnmower",
-    install_requires=['gym', "pygame"],
+    install_requires=['gym', "numpy>=1.17", "pygame", "scipy"],
     packages=find_packages(),
     package_data={"gym_lawnmower": ["envs/resources/*.png"]}
 )